@@ -1,5 +1,24 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .db import configure_sqlite
+        from .querycache import bump_model, cached_models
+        connection_created.connect(
+            configure_sqlite, dispatch_uid='sqlite_pragmas'
+        )
+        for model in cached_models():
+            label = model._meta.label_lower
+            post_save.connect(
+                bump_model, sender=model,
+                dispatch_uid=f'querycache_save:{label}',
+            )
+            post_delete.connect(
+                bump_model, sender=model,
+                dispatch_uid=f'querycache_delete:{label}',
+            )
@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .querycache import caching
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который берет пользователя сессии из кеша запросов.
+
+    Ключ зависит от версии таблицы пользователей, поэтому любое
+    сохранение пользователя, в том числе смена пароля, сбрасывает его.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        users = caching(
+            UserModel._default_manager.filter(pk=user_id)
+        ).cached()
+        user = next(iter(users), None)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,46 @@
+import time
+from contextlib import contextmanager
+
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def temporary_databases(aliases=None):
+    """Создает пустые тестовые базы на время замера, рабочие не трогает."""
+    old_config = setup_databases(
+        verbosity=0, interactive=False, aliases=aliases
+    )
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+
+
+class Timer:
+    def __init__(self):
+        self.samples = []
+
+    @contextmanager
+    def measure(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - started)
+
+    @property
+    def total_ms(self):
+        return sum(self.samples) * 1000
+
+    @property
+    def mean_ms(self):
+        if not self.samples:
+            return 0.0
+        return self.total_ms / len(self.samples)
+
+    def percentile_ms(self, percent):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * percent / 100))
+        return ordered[index] * 1000
@@ -0,0 +1,286 @@
+import hashlib
+import math
+import random
+import time
+from collections import Counter
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import (
+    get_cache_key, get_conditional_response, has_vary_header,
+    learn_cache_key
+)
+from django.utils.http import http_date, quote_etag
+
+from . import routers
+
+TAG_KEY_PREFIX = 'tag:'
+STATS_KEY_PREFIX = 'page_cache:'
+# Сколько устаревшая страница еще может отдаваться, пока ее пересобирают.
+STALE_TIMEOUT = 60 * 10
+# На случай, если пересобиравший страницу процесс упал, не сняв блокировку.
+LOCK_TIMEOUT = 30
+# Чем больше, тем раньше начинается досрочная пересборка (XFetch).
+EARLY_REFRESH_BETA = 1.0
+
+
+def tag(kind, value):
+    return f'{kind}:{value}'
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; версия тега - время его последнего сброса."""
+    keys = {TAG_KEY_PREFIX + name: name for name in tags}
+    found = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags):
+    """Сбрасывает все страницы и фрагменты, объявившие эти теги."""
+    now = time.time()
+    cache.set_many({TAG_KEY_PREFIX + name: now for name in tags}, None)
+
+
+def versions_digest(versions):
+    raw = repr(sorted(versions.items())).encode()
+    return hashlib.md5(raw).hexdigest()
+
+
+class Stats:
+    """Счетчики в общем кеше.
+
+    При flush_every > 1 процесс копит приращения у себя и отправляет
+    их пачкой, чтобы не писать в кеш на каждое событие.
+    """
+
+    def __init__(self, prefix, names, flush_every=1):
+        self.prefix = prefix
+        self.names = names
+        self.flush_every = flush_every
+        self.pending = Counter()
+
+    def key(self, name):
+        return self.prefix + name
+
+    def count(self, name):
+        self.pending[name] += 1
+        if sum(self.pending.values()) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        pending, self.pending = self.pending, Counter()
+        for name, value in pending.items():
+            key = self.key(name)
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                cache.set(key, value, None)
+
+    def values(self):
+        found = cache.get_many([self.key(name) for name in self.names])
+        return {
+            name: found.get(self.key(name), 0) + self.pending[name]
+            for name in self.names
+        }
+
+    def reset(self):
+        self.pending.clear()
+        cache.delete_many([self.key(name) for name in self.names])
+
+
+PAGE_STATS = Stats(
+    STATS_KEY_PREFIX, ('hits', 'stale', 'regenerations', 'not_modified')
+)
+
+
+def stats():
+    """Счетчики попаданий, отдач устаревших страниц, пересборок
+    и ответов 304."""
+    return PAGE_STATS.values()
+
+
+def reset_stats():
+    PAGE_STATS.reset()
+
+
+def acquire_lock(key):
+    return cache.add(key, 1, LOCK_TIMEOUT)
+
+
+def release_lock(key):
+    cache.delete(key)
+
+
+def is_fresh(entry, digest, now):
+    """Запись свежая, если теги не сбрасывались и до истечения далеко.
+
+    Вероятность досрочной пересборки растет по мере приближения к
+    сроку и со временем, которое ушло на прошлую сборку (XFetch).
+    """
+    if entry['digest'] != digest:
+        return False
+    early = entry['delta'] * EARLY_REFRESH_BETA * -math.log(
+        1.0 - random.random()
+    )
+    return now + early < entry['expires']
+
+
+def depends_on_visitor(request):
+    """Страница прочитала сессию (а с ней request.user) или выдала
+    CSRF-токен.
+
+    Vary: Cookie на такой ответ SessionMiddleware и CsrfViewMiddleware
+    ставят уже после кеша, и ключ без него отдал бы чужую страницу
+    другим посетителям.
+    """
+    session = getattr(request, 'session', None)
+    return bool(
+        session is not None and session.accessed
+        or request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def render_shared(view, request, *args, **kwargs):
+    """Рендерит view и сообщает, можно ли отдать ответ всем посетителям.
+
+    Обращения к сессии до view (в middleware) страницу не касаются.
+    """
+    session = getattr(request, 'session', None)
+    accessed = session is not None and session.accessed
+    if session is not None:
+        session.accessed = False
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response, not depends_on_visitor(request)
+    finally:
+        if session is not None:
+            session.accessed = session.accessed or accessed
+
+
+def is_cacheable(request, response):
+    if response.streaming or response.status_code != 200:
+        return False
+    if 'private' in response.get('Cache-Control', ()):
+        return False
+    # Как и CacheMiddleware, не кешируем ответ, который ставит куки
+    # анонимному посетителю и зависит от них.
+    return not (
+        not request.COOKIES and response.cookies
+        and has_vary_header(response, 'Cookie')
+    )
+
+
+def validators(request, digest, last_modified):
+    """ETag и Last-Modified страницы с такими версиями тегов.
+
+    Страница зависит и от посетителя (шапка, CSRF-токен в формах),
+    поэтому в ETag входят куки сессии и CSRF: это не требует запросов
+    к базе. Last-Modified отдается только анонимам - по одной дате
+    нельзя понять, что посетитель с тех пор вошел на сайт.
+    """
+    cookies = (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME, ''),
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+    )
+    etag = quote_etag(versions_digest({digest: cookies}))
+    if any(cookies) or last_modified is None:
+        return etag, None
+    # Округление вниз выдало бы дату раньше последнего сброса тегов.
+    return etag, math.ceil(last_modified)
+
+
+def set_validators(request, response, digest, last_modified):
+    etag, last_modified = validators(request, digest, last_modified)
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cache_page_tagged(timeout, tags, key_prefix=''):
+    """Замена cache_page: страница сбрасывается тегами и не пересобирается
+    всеми процессами разом.
+
+    tags - список тегов или функция (request, *args, **kwargs),
+    возвращающая его. Сброс любого тега делает страницу устаревшей,
+    поэтому timeout может быть большим. Пересобирает страницу только
+    процесс, взявший блокировку, остальные STALE_TIMEOUT секунд получают
+    устаревшую копию. По версиям тегов строятся ETag и Last-Modified,
+    и на условный GET ответ 304 отдается до кеша и до самой view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            names = tags(request, *args, **kwargs) if callable(tags) else tags
+            versions = tag_versions(names)
+            digest = versions_digest(versions)
+            last_modified = max(versions.values(), default=None)
+            etag, modified = validators(request, digest, last_modified)
+            not_modified = get_conditional_response(
+                request, etag=etag, last_modified=modified
+            )
+            if not_modified is not None:
+                PAGE_STATS.count('not_modified')
+                return set_validators(
+                    request, not_modified, digest, last_modified
+                )
+            key = get_cache_key(request, key_prefix, 'GET', cache)
+            entry = cache.get(key) if key else None
+            now = time.time()
+            if entry and is_fresh(entry, digest, now):
+                PAGE_STATS.count('hits')
+                return set_validators(
+                    request, entry['response'], digest, last_modified
+                )
+            lock = f'{key}:lock' if key else None
+            locked = bool(lock) and acquire_lock(lock)
+            if entry and not locked:
+                PAGE_STATS.count(
+                    'stale' if now >= entry['expires']
+                    or entry['digest'] != digest else 'hits'
+                )
+                # Устаревшая копия получает свои валидаторы, чтобы
+                # клиент не закрепил ее под версиями свежей страницы.
+                return set_validators(
+                    request, entry['response'], entry['digest'],
+                    entry.get('last_modified')
+                )
+            try:
+                started = time.time()
+                # Реплика, отставшая от тегов, собрала бы старую страницу
+                # под новыми версиями.
+                with routers.fresh_after(last_modified):
+                    response, shared = render_shared(
+                        view, request, *args, **kwargs
+                    )
+                PAGE_STATS.count('regenerations')
+                if not shared or not is_cacheable(request, response):
+                    return response
+                key = learn_cache_key(
+                    request, response, timeout + STALE_TIMEOUT,
+                    key_prefix, cache
+                )
+                finished = time.time()
+                cache.set(key, {
+                    'response': response,
+                    'digest': digest,
+                    'last_modified': last_modified,
+                    'delta': finished - started,
+                    'expires': finished + timeout,
+                }, timeout + STALE_TIMEOUT)
+            finally:
+                if locked:
+                    release_lock(lock)
+            return set_validators(request, response, digest, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,17 @@
+def apply_pragmas(connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3 в заданном порядке."""
+    for name, value in pragmas.items():
+        connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Настраивает новое соединение SQLite по ключу PRAGMAS базы.
+
+    Django передает OPTIONS прямо в sqlite3.connect, поэтому PRAGMA
+    лежат отдельным ключом рядом с ними.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    apply_pragmas(
+        connection.connection, connection.settings_dict.get('PRAGMAS', {})
+    )
@@ -0,0 +1,48 @@
+import re
+
+from django.core import signing
+from django.template.loader import render_to_string
+
+PLACEHOLDER = '<!--user-fragment:{}-->'
+PLACEHOLDER_RE = re.compile(rb'<!--user-fragment:([\w.:-]+)-->')
+SIGNING_SALT = 'core.fragments'
+
+FRAGMENTS = {}
+
+
+def fragment(name, template_name):
+    """Регистрирует фрагмент страницы, зависящий от посетителя.
+
+    Функция получает request и аргументы из {% user_fragment %} и
+    возвращает контекст шаблона. Сама страница рендерится без
+    обращения к request.user и кешируется одна на всех.
+    """
+    def decorator(context_func):
+        FRAGMENTS[name] = (template_name, context_func)
+        return context_func
+    return decorator
+
+
+def placeholder(name, **kwargs):
+    # Подпись не дает подставить чужой фрагмент через текст записи.
+    payload = signing.dumps([name, kwargs], salt=SIGNING_SALT, compress=True)
+    return PLACEHOLDER.format(payload)
+
+
+def render_fragment(request, match):
+    name, kwargs = signing.loads(match.group(1).decode(), salt=SIGNING_SALT)
+    template_name, context_func = FRAGMENTS[name]
+    return render_to_string(
+        template_name, context_func(request, **kwargs), request=request
+    ).encode()
+
+
+def fill(request, content):
+    return PLACEHOLDER_RE.sub(
+        lambda match: render_fragment(request, match), content
+    )
+
+
+@fragment('header', 'includes/header.html')
+def header(request):
+    return {}
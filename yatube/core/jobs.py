@@ -0,0 +1,150 @@
+import json
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Задержка перед повтором удваивается с каждой попыткой.
+RETRY_DELAY = timedelta(seconds=10)
+RETRY_MAX_DELAY = timedelta(hours=1)
+# Задача, которая выполняется дольше, считается брошенной упавшим
+# воркером и возвращается в очередь.
+RUNNING_TIMEOUT = timedelta(minutes=15)
+# Сколько готовых к запуску задач просматривается за одну попытку захвата.
+CLAIM_BATCH = 10
+
+
+def task_path(task):
+    if isinstance(task, str):
+        return task
+    return f'{task.__module__}.{task.__qualname__}'
+
+
+def encode(args, kwargs):
+    return json.dumps({'args': args, 'kwargs': kwargs}, cls=DjangoJSONEncoder)
+
+
+def call(path, payload):
+    arguments = json.loads(payload)
+    return import_string(path)(*arguments['args'], **arguments['kwargs'])
+
+
+def enqueue(task, *args, **kwargs):
+    """Ставит вызов task(*args, **kwargs) в очередь.
+
+    task - функция уровня модуля или путь к ней, аргументы должны
+    сериализоваться в JSON. Задача пишется в текущей транзакции, поэтому
+    воркеры увидят ее только вместе с данными, которые она обрабатывает.
+    При JOB_QUEUE_EAGER задача сразу выполняется в этом процессе.
+    """
+    path, payload = task_path(task), encode(args, kwargs)
+    if settings.JOB_QUEUE_EAGER:
+        call(path, payload)
+        return None
+    return Job.objects.create(
+        task=path,
+        payload=payload,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        run_at=timezone.now(),
+    )
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def take(ready, worker):
+    for job_id in ready.values_list('pk', flat=True)[:CLAIM_BATCH]:
+        claimed = Job.objects.filter(pk=job_id, status=Job.QUEUED).update(
+            status=Job.RUNNING,
+            worker=worker,
+            started=timezone.now(),
+            attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return job_id
+    return None
+
+
+def claim(worker):
+    """Захватывает одну готовую задачу и возвращает ее id или None.
+
+    Кандидаты выбираются SELECT, а захват - UPDATE с условием на
+    состояние: из нескольких воркеров, выбравших одну задачу, ее получит
+    только один. Где база умеет SKIP LOCKED, чужие кандидаты еще и
+    пропускаются без ожидания.
+    """
+    ready = Job.objects.filter(
+        status=Job.QUEUED, run_at__lte=timezone.now()
+    ).order_by('run_at', 'pk')
+    if not connection.features.has_select_for_update_skip_locked:
+        # SQLite: без общей транзакции, иначе UPDATE после SELECT
+        # получает "database is locked" вместо ожидания.
+        return take(ready, worker)
+    with transaction.atomic():
+        return take(ready.select_for_update(skip_locked=True), worker)
+
+
+def backoff(attempts):
+    return min(RETRY_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+
+
+def finish(job, error=None):
+    """Записывает итог попытки: готово, повтор позже или отказ."""
+    now = timezone.now()
+    if error is None:
+        changes = {'status': Job.DONE, 'finished': now, 'error': ''}
+    elif job.attempts >= job.max_attempts:
+        changes = {'status': Job.FAILED, 'finished': now, 'error': error}
+    else:
+        changes = {
+            'status': Job.QUEUED,
+            'run_at': now + backoff(job.attempts),
+            'error': error,
+        }
+    # Задачу, отнятую как зависшую, итог опоздавшего воркера не трогает.
+    Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, worker=job.worker,
+        started=job.started,
+    ).update(**changes)
+
+
+def execute(job_id):
+    """Выполняет захваченную задачу в потоке или процессе пула."""
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            call(job.task, job.payload)
+        except Exception:
+            logger.exception('Задача %s упала', job)
+            finish(job, traceback.format_exc())
+        else:
+            finish(job)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, брошенные упавшими воркерами."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING, started__lt=now - RUNNING_TIMEOUT
+    )
+    error = 'Воркер не завершил задачу за отведенное время.'
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished=now, error=error
+    )
+    return stale.update(status=Job.QUEUED, run_at=now, error=error)
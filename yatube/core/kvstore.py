@@ -0,0 +1,104 @@
+import pickle
+import threading
+import zlib
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores.base import KVStoreBase, add_prefix
+
+MISSING = object()
+
+
+class ThumbnailCache(FileBasedCache):
+    """Файловый кеш для хранилища ключей sorl-thumbnail.
+
+    В отличие от FileBasedCache не вытесняет записи и хранит рядом со
+    значением его ключ, поэтому умеет перечислять ключи.
+    """
+
+    def _cull(self):
+        pass
+
+    def get(self, key, default=None, version=None):
+        entry = super().get(key, MISSING, version)
+        return default if entry is MISSING else entry[1]
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        super().set(key, (key, value), timeout, version)
+
+    def keys(self, prefix=''):
+        for fname in self._list_cache_files():
+            try:
+                with open(fname, 'rb') as f:
+                    if self._is_expired(f):
+                        continue
+                    key, _ = pickle.loads(zlib.decompress(f.read()))
+            except FileNotFoundError:
+                continue
+            if key.startswith(prefix):
+                yield key
+
+
+class CacheKVStore(KVStoreBase):
+    """Хранилище ключей sorl-thumbnail в кеше THUMBNAIL_CACHE, без базы.
+
+    Значения хранятся без таймаута, поэтому кеш должен быть отдельным
+    и не вытесняющим, например ThumbnailCache. Внутри prefetched() ключи,
+    загруженные одним get_many, читаются из памяти потока.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._local = threading.local()
+
+    @property
+    def cache(self):
+        return caches[settings.THUMBNAIL_CACHE]
+
+    @contextmanager
+    def prefetched(self, image_files):
+        """Загружает записи этих картинок одним обращением к кешу."""
+        keys = [add_prefix(image_file.key) for image_file in image_files]
+        previous = getattr(self._local, 'values', None)
+        values = dict(previous or {})
+        found = self.cache.get_many(keys)
+        values.update((key, found.get(key)) for key in keys)
+        self._local.values = values
+        try:
+            yield
+        finally:
+            self._local.values = previous
+
+    def _get_raw(self, key):
+        values = getattr(self._local, 'values', None)
+        if values is not None and key in values:
+            return values[key]
+        return self.cache.get(key)
+
+    def _set_raw(self, key, value):
+        self.set_many_raw({key: value})
+
+    def set_many_raw(self, data):
+        self.cache.set_many(data, None)
+        values = getattr(self._local, 'values', None)
+        if values is not None:
+            values.update(data)
+
+    def _delete_raw(self, *keys):
+        self.cache.delete_many(keys)
+        values = getattr(self._local, 'values', None)
+        if values is not None:
+            for key in keys:
+                values.pop(key, None)
+
+    def _find_keys_raw(self, prefix):
+        # Нужно командам thumbnail clear и cleanup.
+        if not hasattr(self.cache, 'keys'):
+            raise NotImplementedError(
+                'THUMBNAIL_CACHE не перечисляет ключи: используйте '
+                'core.kvstore.ThumbnailCache.'
+            )
+        return list(self.cache.keys(prefix))
@@ -0,0 +1,176 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.benchmark import Timer
+from core.db import apply_pragmas
+from core.workers import process_pool
+from yatube.settings_production import SQLITE_PRAGMAS
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'pub_date REAL, comments_count INTEGER NOT NULL DEFAULT 0)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE TABLE comment (id INTEGER PRIMARY KEY, post_id INTEGER, '
+    'text TEXT, created REAL)',
+    'CREATE INDEX comment_post_created ON comment (post_id, created)',
+)
+# Как у Django 2.2: sqlite3.connect с таймаутом по умолчанию.
+STOCK_TIMEOUT = 5
+# Имя, PRAGMA и открывается ли соединение на каждую операцию, как при
+# CONN_MAX_AGE = 0.
+PROFILES = (
+    ('stock', {}, True),
+    ('pragmas', SQLITE_PRAGMAS, True),
+    ('tuned', SQLITE_PRAGMAS, False),
+)
+# Каждая десятая запись - новая запись ленты, остальные - комментарии.
+POST_EVERY = 10
+# Процессы стартуют одновременно: на запуск spawn с Django нужна пауза.
+START_DELAY = 3
+
+
+def connect(path, pragmas):
+    connection = sqlite3.connect(
+        path, timeout=STOCK_TIMEOUT, isolation_level=None
+    )
+    apply_pragmas(connection, pragmas)
+    return connection
+
+
+def write(connection, rng, posts):
+    connection.execute('BEGIN')
+    try:
+        if rng.randrange(POST_EVERY) == 0:
+            connection.execute(
+                'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+                ('bench post', time.time()),
+            )
+        else:
+            post_id = rng.randint(1, posts)
+            connection.execute(
+                'INSERT INTO comment (post_id, text, created) '
+                'VALUES (?, ?, ?)',
+                (post_id, 'bench comment', time.time()),
+            )
+            connection.execute(
+                'UPDATE post SET comments_count = comments_count + 1 '
+                'WHERE id = ?', (post_id,),
+            )
+        connection.execute('COMMIT')
+    except sqlite3.OperationalError:
+        connection.execute('ROLLBACK')
+        raise
+
+
+def read(connection, rng, posts):
+    page = connection.execute(
+        'SELECT id, text, comments_count FROM post '
+        'ORDER BY pub_date DESC LIMIT 10 OFFSET ?', (rng.randrange(100),)
+    ).fetchall()
+    connection.execute(
+        'SELECT id, text FROM comment WHERE post_id = ? '
+        'ORDER BY created DESC LIMIT 20', (page[0][0] if page else 1,)
+    ).fetchall()
+
+
+def run_client(role, path, pragmas, reconnect, posts, start, duration, seed):
+    """Крутит операции одной роли до конца замера; возвращает роль,
+    времена успешных операций и число ошибок блокировки."""
+    rng = random.Random(seed)
+    operation = write if role == 'writer' else read
+    timer = Timer()
+    errors = 0
+    connection = None if reconnect else connect(path, pragmas)
+    time.sleep(max(0, start - time.time()))
+    while time.time() < start + duration:
+        try:
+            with timer.measure():
+                if reconnect:
+                    connection = connect(path, pragmas)
+                try:
+                    operation(connection, rng, posts)
+                finally:
+                    if reconnect:
+                        connection.close()
+        except sqlite3.OperationalError:
+            errors += 1
+            timer.samples.pop()
+    return role, timer.samples, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает параллельные чтение и запись в SQLite с настройками '
+        'по умолчанию и с PRAGMA из settings_production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"profile":<8} {"writes/s":>9} {"reads/s":>9} '
+            f'{"w p95 ms":>9} {"r p95 ms":>9} {"locked":>7}'
+        )
+        for name, pragmas, reconnect in PROFILES:
+            directory = tempfile.mkdtemp()
+            try:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.populate(path, pragmas, options['posts'])
+                self.report(
+                    name, self.run(path, pragmas, reconnect, options)
+                )
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def populate(self, path, pragmas, posts):
+        connection = connect(path, pragmas)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        connection.execute('BEGIN')
+        connection.executemany(
+            'INSERT INTO post (text, pub_date) VALUES (?, ?)',
+            (('bench post', time.time() + i) for i in range(posts)),
+        )
+        connection.execute('COMMIT')
+        connection.close()
+
+    def run(self, path, pragmas, reconnect, options):
+        roles = (
+            ['writer'] * options['writers'] + ['reader'] * options['readers']
+        )
+        start = time.time() + START_DELAY
+        with process_pool(len(roles)) as pool:
+            futures = [
+                pool.submit(
+                    run_client, role, path, pragmas, reconnect,
+                    options['posts'], start, options['seconds'], seed,
+                )
+                for seed, role in enumerate(roles)
+            ]
+            results = [future.result() for future in futures]
+        timers = {'writer': Timer(), 'reader': Timer()}
+        errors = 0
+        for role, samples, role_errors in results:
+            timers[role].samples.extend(samples)
+            errors += role_errors
+        return timers, errors, options['seconds']
+
+    def report(self, name, result):
+        timers, errors, seconds = result
+        writer, reader = timers['writer'], timers['reader']
+        self.stdout.write(
+            f'{name:<8} {len(writer.samples) / seconds:>9.0f} '
+            f'{len(reader.samples) / seconds:>9.0f} '
+            f'{writer.percentile_ms(95):>9.2f} '
+            f'{reader.percentile_ms(95):>9.2f} {errors:>7}'
+        )
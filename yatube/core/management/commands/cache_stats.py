@@ -0,0 +1,41 @@
+from django.core.cache import cache as default_cache
+from django.core.management.base import BaseCommand
+
+from core import cache
+from core.querycache import QUERY_STATS
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает счетчики кеша страниц (попадания, отдачи устаревших '
+        'копий, пересборки), кеша запросов (попадания, промахи, сбросы) '
+        'и, для многоуровневого кеша, попадания по уровням.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счетчики после вывода.'
+        )
+
+    def handle(self, *args, **options):
+        QUERY_STATS.flush()
+        stats = {
+            f'page_{name}': value for name, value in cache.stats().items()
+        }
+        stats.update(
+            (f'query_{name}', value)
+            for name, value in QUERY_STATS.values().items()
+        )
+        tiered = hasattr(default_cache, 'stats')
+        if tiered:
+            stats.update(default_cache.stats())
+        for stat, value in stats.items():
+            if isinstance(value, float):
+                value = f'{value:.1%}'
+            self.stdout.write(f'{stat}: {value}')
+        if options['reset']:
+            cache.reset_stats()
+            QUERY_STATS.reset()
+            if tiered:
+                default_cache.reset_stats()
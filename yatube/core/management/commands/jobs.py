@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from core.benchmark import Timer
+from core.models import Job
+
+
+def seconds(samples):
+    """Timer с готовыми длительностями для расчета перцентилей."""
+    timer = Timer()
+    timer.samples = [delta.total_seconds() for delta in samples]
+    return timer
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает глубину очереди фоновых задач и задержки выполненных: '
+        'ожидание в очереди и время работы по каждой функции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=float, default=1,
+            help='За сколько последних часов считать задержки.'
+        )
+        parser.add_argument(
+            '--purge', type=float, metavar='HOURS',
+            help='Удалить выполненные задачи старше стольких часов.'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        depth = dict(
+            Job.objects.values_list('status').annotate(Count('pk'))
+        )
+        ready = Job.objects.filter(
+            status=Job.QUEUED, run_at__lte=now
+        ).aggregate(count=Count('pk'), oldest=Min('run_at'))
+        oldest = ready['oldest']
+        self.stdout.write(
+            f'ready: {ready["count"]}\n'
+            f'delayed: {depth.get(Job.QUEUED, 0) - ready["count"]}\n'
+            f'running: {depth.get(Job.RUNNING, 0)}\n'
+            f'failed: {depth.get(Job.FAILED, 0)}\n'
+            f'done: {depth.get(Job.DONE, 0)}\n'
+            f'oldest_ready_s: '
+            f'{(now - oldest).total_seconds() if oldest else 0:.1f}'
+        )
+        self.report_latency(now - timedelta(hours=options['hours']))
+        if options['purge'] is not None:
+            deleted, _ = Job.objects.filter(
+                status=Job.DONE,
+                finished__lt=now - timedelta(hours=options['purge']),
+            ).delete()
+            self.stdout.write(f'Удалено выполненных задач: {deleted}.')
+
+    def report_latency(self, since):
+        finished = {}
+        for task, created, started, ended in Job.objects.filter(
+            status=Job.DONE, finished__gte=since
+        ).values_list('task', 'created', 'started', 'finished'):
+            waits, runs = finished.setdefault(task, ([], []))
+            waits.append(started - created)
+            runs.append(ended - started)
+        self.stdout.write(
+            f'\n{"task":<40} {"done":>6} {"wait p50 ms":>11} '
+            f'{"wait p95 ms":>11} {"run p50 ms":>11} {"run p95 ms":>11}'
+        )
+        for task, (waits, runs) in sorted(finished.items()):
+            waits, runs = seconds(waits), seconds(runs)
+            self.stdout.write(
+                f'{task:<40} {len(runs.samples):>6} '
+                f'{waits.percentile_ms(50):>11.0f} '
+                f'{waits.percentile_ms(95):>11.0f} '
+                f'{runs.percentile_ms(50):>11.0f} '
+                f'{runs.percentile_ms(95):>11.0f}'
+            )
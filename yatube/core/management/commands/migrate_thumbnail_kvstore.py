@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит записи sorl-thumbnail из таблицы KVStore в кеш '
+        'для core.kvstore.CacheKVStore.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Удалить перенесенные строки из базы.'
+        )
+
+    def move(self, batch, delete):
+        default.kvstore.set_many_raw(batch)
+        if delete:
+            KVStore.objects.filter(key__in=list(batch)).delete()
+        return len(batch)
+
+    def handle(self, *args, **options):
+        rows = KVStore.objects.order_by('key').values_list('key', 'value')
+        moved = 0
+        batch = {}
+        for key, value in rows.iterator(chunk_size=BATCH_SIZE):
+            batch[key] = value
+            if len(batch) == BATCH_SIZE:
+                moved += self.move(batch, options['delete'])
+                batch = {}
+        if batch:
+            moved += self.move(batch, options['delete'])
+        self.stdout.write(self.style.SUCCESS(f'Перенесено записей: {moved}.'))
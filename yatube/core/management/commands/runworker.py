@@ -0,0 +1,75 @@
+import signal
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from core import jobs
+from core.workers import process_pool
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из очереди в пуле потоков или процессов. '
+        'Воркеров можно запускать несколько, в том числе на разных машинах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо потоков: для задач, занимающих '
+                 'процессор, например миниатюр.'
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1,
+            help='Пауза между проверками пустой очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда готовых задач не останется.'
+        )
+
+    def handle(self, *args, **options):
+        stopping = threading.Event()
+        # SIGTERM дает доделать начатые задачи, новые не берутся.
+        signal.signal(signal.SIGTERM, lambda *args: stopping.set())
+        worker = jobs.worker_name()
+        if options['processes']:
+            pool = process_pool(options['workers'])
+        else:
+            pool = ThreadPoolExecutor(max_workers=options['workers'])
+        self.stdout.write(
+            f'Воркер {worker}: {options["workers"]} '
+            f'{"процессов" if options["processes"] else "потоков"}.'
+        )
+        done = 0
+        with pool:
+            running = set()
+            while not stopping.is_set():
+                jobs.requeue_stale()
+                while len(running) < options['workers']:
+                    job_id = jobs.claim(worker)
+                    if job_id is None:
+                        break
+                    running.add(pool.submit(jobs.execute, job_id))
+                if not running:
+                    if options['once']:
+                        break
+                    stopping.wait(options['poll'])
+                    continue
+                finished, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                done += len(finished)
+                for future in finished:
+                    if future.exception() is not None:
+                        self.stderr.write(
+                            f'Сбой воркера: {future.exception()!r}'
+                        )
+            done += len(running)
+        self.stdout.write(f'Обработано задач: {done}.')
@@ -0,0 +1,49 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core import routers
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файл реплики через backup API '
+        'и отмечает в кеше время копии.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые столько секунд; 0 - скопировать один раз.'
+        )
+
+    def handle(self, *args, **options):
+        if not routers.replica_enabled():
+            raise CommandError('Алиас replica не настроен в DATABASES.')
+        while True:
+            started = time.time()
+            self.sync()
+            routers.mark_synced(started)
+            self.stdout.write(
+                f'Реплика синхронизирована за '
+                f'{(time.time() - started) * 1000:.0f} мс.'
+            )
+            if not options['interval']:
+                return
+            time.sleep(max(0, started + options['interval'] - time.time()))
+
+    def sync(self):
+        source = connections[DEFAULT_DB_ALIAS]
+        source.ensure_connection()
+        replica = settings.DATABASES[routers.REPLICA_DB_ALIAS]
+        # PRAGMA реплики (query_only) сюда не применяются: это писатель.
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            # Одним шагом: копия соответствует снимку на начало backup,
+            # а читатели реплики видят либо старую, либо новую версию.
+            source.connection.backup(target)
+        finally:
+            target.close()
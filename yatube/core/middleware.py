@@ -0,0 +1,71 @@
+import time
+
+from . import fragments, routers
+
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+
+class UserFragmentsMiddleware:
+    """Подставляет в HTML фрагменты, зависящие от посетителя.
+
+    Стоит после AuthenticationMiddleware: фрагментам нужен request.user,
+    а SessionMiddleware и CsrfViewMiddleware должны увидеть обращения
+    к сессии и CSRF-токену при их рендере.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not response.streaming
+            and 'text/html' in response.get('Content-Type', '')
+            and b'<!--user-fragment:' in response.content
+        ):
+            response.content = fragments.fill(request, response.content)
+        return response
+
+
+def written_at(request):
+    """Время последней записи посетителя из куки, 0 - если ее нет."""
+    value = request.COOKIES.get(REPLICA_PIN_COOKIE)
+    if value is None:
+        return 0
+    try:
+        return float(value)
+    except ValueError:
+        # Испорченная кука держит посетителя в основной базе до
+        # следующей синхронизации.
+        return time.time()
+
+
+class ReplicaMiddleware:
+    """Пускает GET-запросы читать из реплики и дает посетителю прочитать
+    свои записи.
+
+    После запроса, который что-то записал, посетитель получает куку со
+    временем записи, и его запросы читают основную базу, пока реплика
+    не синхронизируется позже этого времени; тогда кука удаляется.
+    Стоит первым, чтобы учесть и запись сессии в SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        written = written_at(request)
+        with routers.replica_reads(
+            request.method not in ('GET', 'HEAD')
+        ) as state, routers.fresh_after(written):
+            response = self.get_response(request)
+            if not routers.replica_enabled():
+                return response
+            if getattr(state, 'wrote', False):
+                response.set_cookie(
+                    REPLICA_PIN_COOKIE, repr(time.time()), httponly=True,
+                    samesite='Lax',
+                )
+            elif written and routers.synced_at() >= written:
+                response.delete_cookie(REPLICA_PIN_COOKIE)
+        return response
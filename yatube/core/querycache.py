@@ -0,0 +1,174 @@
+import hashlib
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, router, transaction
+
+from . import routers
+from .cache import Stats, invalidate_tags, tag, tag_versions, versions_digest
+
+QUERY_KEY_PREFIX = 'query:'
+# Версии таблиц сбрасывают результаты сразу; таймаут лишь страхует от
+# записей в обход ORM.
+QUERY_CACHE_TIMEOUT = 60 * 60
+QUERY_STATS = Stats(
+    'query_cache:', ('hits', 'misses', 'invalidations'), flush_every=100
+)
+
+_deferred = threading.local()
+
+
+def table_tag(table):
+    return tag('table', table)
+
+
+def bump_tables(*tables, using='default'):
+    """Сбрасывает закешированные запросы к этим таблицам.
+
+    Версии меняются сразу и еще раз после коммита: иначе другой запрос
+    мог бы успеть закешировать строки, прочитанные до коммита.
+    """
+    deferred = getattr(_deferred, 'tables', None)
+    if deferred is not None:
+        deferred.update(tables)
+        return
+    tags = [table_tag(table) for table in tables]
+
+    def bump():
+        invalidate_tags(*tags)
+        for _ in tables:
+            QUERY_STATS.count('invalidations')
+
+    bump()
+    if transaction.get_connection(using).in_atomic_block:
+        transaction.on_commit(bump, using=using)
+
+
+@contextmanager
+def deferred_bumps(using='default'):
+    """Копит сбросы таблиц и выполняет их одним вызовом на выходе,
+    чтобы удаление тысячи строк не писало в кеш тысячу раз."""
+    if getattr(_deferred, 'tables', None) is not None:
+        yield
+        return
+    _deferred.tables = set()
+    try:
+        yield
+    finally:
+        tables, _deferred.tables = _deferred.tables, None
+        if tables:
+            bump_tables(*sorted(tables), using=using)
+
+
+def bump_model(sender, using='default', **kwargs):
+    bump_tables(sender._meta.db_table, using=using)
+
+
+def cached_models():
+    """Модели, чьи таблицы попадают в закешированные запросы: с
+    CachingManager и пользователь, которого читают через caching().
+
+    Сигналы подключаются только к ним: у остальных моделей слушатели
+    post_delete отключили бы быстрое удаление одним DELETE.
+    """
+    user_model = get_user_model()
+    return [
+        model for model in apps.get_models()
+        if model is user_model or issubclass(
+            model._default_manager._queryset_class, CachingQuerySet
+        )
+    ]
+
+
+def referenced_tables(sql, using):
+    quote_name = connections[using].ops.quote_name
+    return sorted({
+        model._meta.db_table for model in apps.get_models()
+        if quote_name(model._meta.db_table) in sql
+    })
+
+
+class CachingQuerySet(models.QuerySet):
+    """QuerySet, результаты которого можно закешировать вызовом cached().
+
+    Ключ строится из SQL, параметров и версий всех упомянутых в SQL
+    таблиц. Версии сбрасываются сигналами сохранения и удаления моделей
+    из cached_models(), а также update(), bulk_create() и delete() этого
+    QuerySet.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache_timeout = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._cache_timeout = self._cache_timeout
+        return clone
+
+    def cached(self, timeout=QUERY_CACHE_TIMEOUT):
+        clone = self._chain()
+        clone._cache_timeout = timeout
+        return clone
+
+    def cache_key(self):
+        compiler = self.query.get_compiler(using=self.db)
+        sql, params = compiler.as_sql()
+        tables = referenced_tables(sql, self.db)
+        versions = tag_versions([table_tag(table) for table in tables])
+        if self._db is None:
+            # Реплика, еще не получившая последние записи в эти таблицы,
+            # закешировала бы старый результат под новыми версиями.
+            self._db = routers.fresh_alias(self.db, versions)
+        raw = repr((self.db, sql, params, versions_digest(versions)))
+        return QUERY_KEY_PREFIX + hashlib.md5(raw.encode()).hexdigest()
+
+    def _fetch_all(self):
+        if self._cache_timeout is None or self._result_cache is not None:
+            return super()._fetch_all()
+        try:
+            key = self.cache_key()
+        except EmptyResultSet:
+            return super()._fetch_all()
+        self._result_cache = cache.get(key)
+        if self._result_cache is not None:
+            QUERY_STATS.count('hits')
+        else:
+            QUERY_STATS.count('misses')
+            self._result_cache = list(self._iterable_class(self))
+            cache.set(key, self._result_cache, self._cache_timeout)
+        super()._fetch_all()
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        bump_tables(self.model._meta.db_table, using=self.db)
+        return rows
+
+    def delete(self):
+        using = self._db or router.db_for_write(self.model)
+        with deferred_bumps(using):
+            bump_tables(self.model._meta.db_table, using=using)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        bump_tables(self.model._meta.db_table, using=self.db)
+        return objs
+
+
+CachingManager = models.Manager.from_queryset(CachingQuerySet)
+
+
+def caching(queryset):
+    """Делает CachingQuerySet из QuerySet чужой модели, например User."""
+    return CachingQuerySet(
+        model=queryset.model, query=queryset.query.chain(),
+        using=queryset._db
+    )
@@ -0,0 +1,139 @@
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+REPLICA_DB_ALIAS = 'replica'
+SYNCED_AT_KEY = 'replica:synced_at'
+
+_state = threading.local()
+
+
+def replica_enabled():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+def synced_at():
+    """Когда началась последняя синхронизация реплики: все записанное
+    раньше в ней уже есть."""
+    if not hasattr(_state, 'allowed'):
+        return cache.get(SYNCED_AT_KEY, 0)
+    # В запросе время читается из кеша один раз.
+    if not hasattr(_state, 'synced_at'):
+        _state.synced_at = cache.get(SYNCED_AT_KEY, 0)
+    return _state.synced_at
+
+
+def mark_synced(timestamp):
+    cache.set(SYNCED_AT_KEY, timestamp, None)
+
+
+@contextmanager
+def replica_reads(pinned=False):
+    """Разрешает читать из реплики до конца блока, обычно - запроса.
+
+    pinned оставляет чтение в основной базе: запрос недавно писал.
+    """
+    _state.__dict__.clear()
+    _state.allowed = replica_enabled() and not pinned
+    try:
+        yield _state
+    finally:
+        _state.__dict__.clear()
+
+
+@contextmanager
+def fresh_after(timestamp):
+    """Чтения в блоке должны видеть записи, сделанные к timestamp.
+
+    Если реплика синхронизирована раньше, читается основная база.
+    """
+    previous = getattr(_state, 'fresh_after', 0)
+    _state.fresh_after = max(previous, timestamp or 0)
+    try:
+        yield
+    finally:
+        _state.fresh_after = previous
+
+
+def read_alias(fresh_after=0):
+    if not getattr(_state, 'allowed', False) or getattr(
+            _state, 'wrote', False):
+        return DEFAULT_DB_ALIAS
+    # Чтение внутри транзакции основной базы должно видеть ее изменения.
+    if transaction.get_connection(DEFAULT_DB_ALIAS).in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    needed = max(getattr(_state, 'fresh_after', 0), fresh_after)
+    synced = synced_at()
+    # 0 - реплику еще ни разу не синхронизировали или время потеряно
+    # вместе с кешем.
+    if not synced or synced < needed:
+        return DEFAULT_DB_ALIAS
+    return REPLICA_DB_ALIAS
+
+
+def fresh_alias(alias, versions):
+    """alias, если это не реплика, отставшая от версий таблиц запроса."""
+    if alias != REPLICA_DB_ALIAS:
+        return alias
+    return read_alias(max(versions.values(), default=0))
+
+
+class AppDatabaseRouter:
+    """Держит приложения из DATABASE_APPS_MAPPING в своих базах.
+
+    Приложение, чей алиас не настроен в DATABASES, остается в основной
+    базе; в чужих базах его таблицы не создаются.
+    """
+
+    def _alias(self, app_label):
+        alias = settings.DATABASE_APPS_MAPPING.get(app_label)
+        return alias if alias in settings.DATABASES else None
+
+    def db_for_read(self, model, **hints):
+        return self._alias(model._meta.app_label)
+
+    def db_for_write(self, model, **hints):
+        return self._alias(model._meta.app_label)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._alias(obj1._meta.app_label) or self._alias(
+                obj2._meta.app_label):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        alias = self._alias(app_label)
+        if alias:
+            return db == alias
+        if db in settings.DATABASE_APPS_MAPPING.values():
+            return False
+        return None
+
+
+class ReplicaRouter:
+    """Читает из реплики, пишет в основную базу.
+
+    Реплика используется только внутри replica_reads(), то есть в
+    GET-запросах (см. ReplicaMiddleware); после первой записи запрос
+    читает только основную базу. Без алиаса replica роутер ничего
+    не меняет.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        if getattr(_state, 'allowed', None) is not None:
+            _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == REPLICA_DB_ALIAS:
+            return False
+        return None
@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.contrib.sessions.backends import cached_db
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+SESSION_KEY_PREFIX = 'session_cache:'
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+class SessionStore(cached_db.SessionStore):
+    """Сессии в кеше с отложенной записью в базу.
+
+    Сессия читается из кеша, база нужна, только если запись из кеша
+    пропала. Новая сессия и смена пользователя в ней пишутся в базу
+    сразу; прочие изменения - не чаще раза в SESSION_WRITE_BEHIND_SECONDS,
+    при первом сохранении после этого срока. Если запись вытеснят из
+    кеша раньше, потеряются только эти изменения, но не вход на сайт.
+    """
+
+    cache_key_prefix = SESSION_KEY_PREFIX
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Как в cached_db: некорректный ключ просто сбрасывает сессию.
+            entry = None
+        if entry is None:
+            session = self._get_session_from_db()
+            if not session:
+                return {}
+            data = self.decode(session.session_data)
+            entry = {'data': data, 'synced': self._synced_state(data)}
+            self._cache.set(
+                self.cache_key, entry,
+                self.get_expiry_age(expiry=session.expire_date),
+            )
+        self._synced = entry['synced']
+        return entry['data']
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        synced = None if must_create else getattr(self, '_synced', None)
+        if (
+            synced is None
+            or synced['auth'] != self._auth(data)
+            or time.time() - synced['at']
+            >= settings.SESSION_WRITE_BEHIND_SECONDS
+        ):
+            DBStore.save(self, must_create)
+            synced = self._synced_state(data)
+        self._synced = synced
+        self._cache.set(
+            self.cache_key, {'data': data, 'synced': synced},
+            self.get_expiry_age(),
+        )
+
+    def _auth(self, data):
+        return [data.get(key) for key in AUTH_KEYS]
+
+    def _synced_state(self, data):
+        """Что и когда последний раз записано в базу."""
+        return {'auth': self._auth(data), 'at': time.time()}
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+HASH_ALGORITHM = 'sha256'
+HASH_LENGTH = hashlib.new(HASH_ALGORITHM).digest_size * 2
+# Две ступени по два символа хеша: 65536 папок по несколько файлов.
+SHARD_WIDTH = 2
+SHARD_LEVELS = 2
+# Загрузка пишется сюда, пока не известен хеш; папка на том же диске,
+# что и хранилище, иначе os.link не сработает.
+INCOMING_DIR = '.incoming'
+
+
+def shards(digest):
+    return [
+        digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH]
+        for level in range(SHARD_LEVELS)
+    ]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - хеш его содержимого.
+
+    Файл из upload_to/имя.jpg сохраняется как upload_to/ab/cd/abcd...jpg:
+    хеш считается по ходу записи загрузки во временный файл, одинаковые
+    загрузки хранятся одной копией. Число ссылок на файл ведет StoredFile;
+    delete() снимает одну ссылку и удаляет файл вместе с последней.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя все равно заменится хешем, а совпадение имен - это дубликат.
+        return name
+
+    def addressed_name(self, name, digest):
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), *shards(digest), digest + extension
+        )
+
+    def is_addressed(self, name):
+        """Лежит ли файл уже по адресу своего хеша."""
+        parts = name.split('/')
+        digest = os.path.splitext(parts[-1])[0]
+        return (
+            len(parts) > SHARD_LEVELS
+            and len(digest) == HASH_LENGTH
+            and parts[-SHARD_LEVELS - 1:-1] == shards(digest)
+        )
+
+    def _save(self, name, content):
+        incoming = self.path(INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            digest = getattr(content, 'content_hash', None)
+            if digest and hasattr(content, 'temporary_file_path'):
+                # Хеш посчитан HashingUploadHandler, файл только переносится.
+                os.close(fd)
+                file_move_safe(
+                    content.temporary_file_path(), tmp_path,
+                    allow_overwrite=True
+                )
+            else:
+                digest = self._write(content, fd)
+            name = self.addressed_name(name, digest)
+            # Ссылка учитывается до появления файла: так параллельный
+            # delete() последней ссылки не удалит файл у нас из-под ног.
+            self.add_reference(name)
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(tmp_path, full_path)
+            except FileExistsError:
+                pass
+            else:
+                if self.file_permissions_mode is not None:
+                    os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            os.remove(tmp_path)
+        return name
+
+    def _write(self, content, fd):
+        digest = hashlib.new(HASH_ALGORITHM)
+        with open(fd, 'wb') as tmp:
+            for chunk in content.chunks():
+                digest.update(chunk)
+                tmp.write(chunk)
+        return digest.hexdigest()
+
+    def add_reference(self, name, count=1):
+        updated = StoredFile.objects.filter(name=name).update(
+            references=F('references') + count
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, references=count)
+        except IntegrityError:
+            self.add_reference(name, count)
+
+    def delete(self, name):
+        """Снимает ссылку на файл; файлы не по хешу удаляются сразу."""
+        if not self.is_addressed(name):
+            super().delete(name)
+            return
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if stored is not None and stored.references > 1:
+                StoredFile.objects.filter(name=name).update(
+                    references=F('references') - 1
+                )
+                return
+            StoredFile.objects.filter(name=name).delete()
+            # Файл удаляется, пока строка заблокирована: новая ссылка на
+            # него появится только после коммита и заново создаст файл.
+            super().delete(name)
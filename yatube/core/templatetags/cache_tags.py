@@ -0,0 +1,29 @@
+from django import template
+
+from django.utils.safestring import mark_safe
+
+from core.cache import tag, tag_versions, versions_digest
+from core.fragments import placeholder
+
+register = template.Library()
+
+
+@register.simple_tag
+def cache_version(**tags):
+    """Версия набора тегов для {% cache %}:
+    {% cache_version post=post.pk group=post.group.slug as version %}
+
+    Пустые значения (например, slug отсутствующей группы) пропускаются.
+    """
+    names = [
+        tag(kind, value) for kind, value in tags.items()
+        if value not in (None, '')
+    ]
+    return versions_digest(tag_versions(names))
+
+
+@register.simple_tag
+def user_fragment(name, **kwargs):
+    """Место для фрагмента, который UserFragmentsMiddleware отрендерит
+    для каждого посетителя: {% user_fragment 'header' %}"""
+    return mark_safe(placeholder(name, **kwargs))
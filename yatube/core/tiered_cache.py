@@ -0,0 +1,244 @@
+import fcntl
+import os
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+LOCK_FILE = 'cache.lock'
+STATS_KEY_PREFIX = 'tiered_cache:stats:'
+STATS = ('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses')
+# Локальные счетчики сбрасываются в общий уровень раз в столько обращений.
+STATS_FLUSH_EVERY = 100
+
+MISSING = object()
+
+
+class SharedFileCache(FileBasedCache):
+    """FileBasedCache с атомарными add и incr: на add держатся блокировки
+    cache_page_tagged, на incr - счетчики, а у FileBasedCache между
+    чтением и записью есть гонка.
+
+    Обе операции выполняются под flock на файле в каталоге кеша.
+    Просроченный файл удаляется только под ней же, иначе процесс,
+    увидевший его просроченным, мог бы удалить свежий файл, который
+    другой процесс успел записать на его место.
+    """
+
+    def _is_expired(self, f):
+        try:
+            expires = pickle.load(f)
+        except EOFError:
+            expires = 0
+        return expires is not None and expires < time.time()
+
+    @contextmanager
+    def _locked(self):
+        self._createdir()
+        with open(os.path.join(self._dir, LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def get_entry(self, key, version=None):
+        """Значение и время его истечения (None - бессрочно) или MISSING."""
+        try:
+            with open(self._key_to_file(key, version), 'rb') as f:
+                try:
+                    expires = pickle.load(f)
+                except EOFError:
+                    return MISSING
+                if expires is not None and expires < time.time():
+                    return MISSING
+                return pickle.loads(zlib.decompress(f.read())), expires
+        except FileNotFoundError:
+            return MISSING
+
+    def _write_entry(self, fname, expires, value, replace=True):
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                f.write(pickle.dumps(expires, self.pickle_protocol))
+                f.write(zlib.compress(
+                    pickle.dumps(value, self.pickle_protocol)
+                ))
+            if replace:
+                os.replace(tmp_path, fname)
+            else:
+                # set из другого процесса блокировку не берет.
+                os.link(tmp_path, fname)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        fname = self._key_to_file(key, version)
+        self._cull()
+        with self._locked():
+            if self.has_key(key, version):
+                return False
+            self._delete(fname)
+            try:
+                self._write_entry(
+                    fname, self.get_backend_timeout(timeout), value,
+                    replace=False,
+                )
+            except FileExistsError:
+                return False
+            return True
+
+    def incr(self, key, delta=1, version=None):
+        with self._locked():
+            entry = self.get_entry(key, version)
+            if entry is MISSING:
+                raise ValueError(f"Key '{key}' not found")
+            value, expires = entry
+            value += delta
+            self._write_entry(self._key_to_file(key, version), expires, value)
+            return value
+
+
+class TieredCache(BaseCache):
+    """Небольшой LRU в памяти процесса перед общим файловым кешем.
+
+    Вместе со значением L1 запоминает inode и mtime его файла в общем
+    уровне и при чтении сверяет их через os.stat: запись или удаление
+    ключа в любом процессе меняет файл, и L1 всех процессов перечитывает
+    только этот ключ. Ключи с префиксами из L2_ONLY_PREFIXES (часто
+    меняющиеся счетчики, блокировки) в L1 не попадают.
+
+    OPTIONS: L1_MAX_ENTRIES, L1_TIMEOUT - сколько секунд значение
+    может жить в L1, L2_ONLY_PREFIXES, остальное уходит в FileBasedCache.
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.l1_timeout = options.pop('L1_TIMEOUT', 60)
+        self.l2_only_prefixes = tuple(options.pop('L2_ONLY_PREFIXES', ()))
+        params = {**params, 'OPTIONS': options}
+        super().__init__(params)
+        self.l2 = SharedFileCache(location, params)
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def _is_l2_only(self, key):
+        return key.startswith(self.l2_only_prefixes)
+
+    def _file_version(self, key, version):
+        try:
+            stat = os.stat(self.l2._key_to_file(key, version))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _count(self, stat):
+        self._counts[stat] += 1
+        if sum(self._counts.values()) >= STATS_FLUSH_EVERY:
+            self.flush_stats()
+
+    def flush_stats(self):
+        counts, self._counts = self._counts, Counter()
+        for stat, value in counts.items():
+            key = STATS_KEY_PREFIX + stat
+            self.l2.add(key, 0, None)
+            try:
+                self.l2.incr(key, value)
+            except ValueError:
+                self.l2.set(key, value, None)
+
+    def stats(self):
+        """Попадания и промахи по уровням всех процессов."""
+        found = self.l2.get_many([STATS_KEY_PREFIX + stat for stat in STATS])
+        totals = {
+            stat: found.get(STATS_KEY_PREFIX + stat, 0) + self._counts[stat]
+            for stat in STATS
+        }
+        for tier in ('l1', 'l2'):
+            hits, misses = totals[f'{tier}_hits'], totals[f'{tier}_misses']
+            totals[f'{tier}_hit_rate'] = (
+                hits / (hits + misses) if hits + misses else 0.0
+            )
+        return totals
+
+    def reset_stats(self):
+        self._counts.clear()
+        self.l2.delete_many([STATS_KEY_PREFIX + stat for stat in STATS])
+
+    def get(self, key, default=None, version=None):
+        if self._is_l2_only(key):
+            return self.l2.get(key, default, version)
+        local_key = self.make_key(key, version)
+        # Версия берется до чтения: если файл успеют заменить, следующее
+        # чтение увидит новую версию и перечитает значение.
+        file_version = self._file_version(key, version)
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(local_key)
+            fresh = (
+                entry is not None and file_version is not None
+                and entry[1] == file_version and entry[2] > now
+            )
+            if fresh:
+                self._l1.move_to_end(local_key)
+            elif entry is not None:
+                del self._l1[local_key]
+        if fresh:
+            self._count('l1_hits')
+            return pickle.loads(entry[0])
+        self._count('l1_misses')
+        entry = self.l2.get_entry(key, version)
+        if entry is MISSING:
+            self._count('l2_misses')
+            return default
+        self._count('l2_hits')
+        value, expires = entry
+        # В L1 значение живет не дольше, чем в общем уровне.
+        l1_expires = now + self.l1_timeout
+        if expires is not None:
+            l1_expires = min(l1_expires, expires)
+        with self._lock:
+            self._l1[local_key] = (
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                file_version,
+                l1_expires,
+            )
+            self._l1.move_to_end(local_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.add(key, value, timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        self.l2.delete(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.l2.incr(key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.l2.set_many(data, timeout, version)
+
+    def delete_many(self, keys, version=None):
+        self.l2.delete_many(keys, version)
+
+    def has_key(self, key, version=None):
+        return self.get(key, MISSING, version) is not MISSING
+
+    def clear(self):
+        self.l2.clear()
+        with self._lock:
+            self._l1.clear()
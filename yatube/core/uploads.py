@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image
+
+from .storage import HASH_ALGORITHM
+
+# Параметры сохранения уменьшенной копии по форматам.
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+# Сразу в уменьшенном масштабе (draft) декодирует только JPEG.
+DRAFT_FORMATS = ('JPEG',)
+
+
+class HashingUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загрузку сразу во временный файл и считает хеш по ходу.
+
+    В памяти держится только текущий кусок. Готовый файл получает
+    content_hash, и ContentAddressedStorage не читает его второй раз.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.new(HASH_ALGORITHM)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_ = super().file_complete(file_size)
+        file_.content_hash = self.digest.hexdigest()
+        return file_
+
+
+def open_header(file_):
+    """Открывает картинку, прочитав только заголовок: размеры и формат
+    известны, пиксели еще не декодированы."""
+    if hasattr(file_, 'temporary_file_path'):
+        return Image.open(file_.temporary_file_path())
+    file_.seek(0)
+    return Image.open(file_)
+
+
+def max_pixels(image_format):
+    """Предел кадра для формата: без draft уменьшение декодирует кадр
+    целиком, и для таких форматов предел ниже."""
+    if image_format in DRAFT_FORMATS:
+        return settings.IMAGE_UPLOAD_MAX_PIXELS
+    return min(
+        settings.IMAGE_UPLOAD_MAX_PIXELS,
+        settings.IMAGE_UPLOAD_MAX_DECODED_PIXELS,
+    )
+
+
+def downscale(file_, image, max_side):
+    """Копия загрузки, уменьшенная до max_side по большей стороне.
+
+    draft() просит декодер JPEG сразу отдать кадр в масштабе 1/2-1/8,
+    не меньшем max_side, так что полный кадр в память не попадает.
+    """
+    image_format = image.format
+    info = image.info
+    image.draft(None, (max_side, max_side))
+    image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=None)
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    for key in ('exif', 'icc_profile'):
+        if info.get(key):
+            options[key] = info[key]
+    resized = TemporaryUploadedFile(
+        file_.name, Image.MIME.get(image_format, file_.content_type), 0,
+        file_.charset, getattr(file_, 'content_type_extra', None)
+    )
+    image.save(resized.file, image_format, **options)
+    resized.flush()
+    resized.size = os.path.getsize(resized.temporary_file_path())
+    resized.seek(0)
+    return resized
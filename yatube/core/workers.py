@@ -0,0 +1,25 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+
+def setup_django(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def process_pool(max_workers):
+    """Пул процессов с настроенным Django.
+
+    Процессы запускаются через spawn, а не fork: так они не наследуют
+    открытые соединения с базой и потоки воркера.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=setup_django,
+        initargs=(settings.SETTINGS_MODULE,),
+    )
@@ -0,0 +1,87 @@
+from core.querycache import caching
+from . import timeline
+from .models import Comment, Follow, Post, User
+
+POST_CARD_FIELDS = (
+    'id',
+    'text',
+    'pub_date',
+    'image',
+    'image_placeholder',
+    'author',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group',
+    'group__title',
+    'group__slug',
+)
+
+# Сколько SQL-запросов может сделать страница ленты, считая сессию и
+# пользователя авторизованного запроса, подсчет записей для Paginator
+# и поиск тегов кеша страницы.
+QUERY_BUDGETS = {
+    'index': 4,
+    'group_posts': 5,
+    'profile': 7,
+    'follow_index': 5,
+}
+
+
+def post_cards():
+    """Записи со всем, что нужно шаблону includes/post_card.html,
+    за один запрос."""
+    return Post.objects.select_related('author', 'group').only(
+        *POST_CARD_FIELDS
+    )
+
+
+def index():
+    return post_cards()
+
+
+def group(group):
+    return post_cards().filter(group=group)
+
+
+def profile(author):
+    return post_cards().filter(author=author)
+
+
+def follow(user):
+    return timeline.feed(user)
+
+
+def group_estimate(group):
+    """Оценка числа записей группы для Paginator: ее счетчик."""
+    return lambda: group.posts_count
+
+
+def follow_estimate(user):
+    return lambda: timeline.estimate(user)
+
+
+def profile_estimate(author):
+    stats = getattr(author, 'stats', None)
+    return lambda: stats.posts_count if stats else None
+
+
+def post_detail():
+    return Post.objects.select_related('author__stats', 'group')
+
+
+def comments(post_id):
+    return Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('id', 'text', 'created', 'post', 'author', 'author__username')
+
+
+def authors():
+    return caching(User.objects.select_related('stats'))
+
+
+def is_following(user, username):
+    return user.is_authenticated and Follow.objects.filter(
+        user=user,
+        author__username=username
+    ).exists()
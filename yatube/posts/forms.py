@@ -1,5 +1,9 @@
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
 
+from core import uploads
 from posts.models import Post, Comment
 
 
@@ -8,6 +12,39 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Проверяет загрузку по заголовку и уменьшает большие картинки.
+
+        Пиксели декодируются только при уменьшении, JPEG - через draft;
+        слишком большой кадр отклоняется, не дойдя до декодера.
+        """
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        with uploads.open_header(image) as header:
+            if header.format not in settings.IMAGE_UPLOAD_FORMATS:
+                raise ValidationError(
+                    'Формат %(format)s не поддерживается.',
+                    code='format', params={'format': header.format},
+                )
+            width, height = header.size
+            limit = uploads.max_pixels(header.format)
+            if width * height > limit:
+                raise ValidationError(
+                    'Слишком большая картинка: %(pixels).0f Мп, '
+                    'допустимо не больше %(limit).0f Мп.',
+                    code='too_large', params={
+                        'pixels': width * height / 10 ** 6,
+                        'limit': limit / 10 ** 6,
+                    },
+                )
+            if max(width, height) > settings.IMAGE_UPLOAD_MAX_SIDE:
+                image = uploads.downscale(
+                    image, header, settings.IMAGE_UPLOAD_MAX_SIDE
+                )
+        image.seek(0)
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,27 @@
+from core.fragments import fragment
+from . import feeds
+from .forms import CommentForm
+
+
+@fragment('switcher', 'posts/includes/switcher.html')
+def switcher(request, index=False, follow=False):
+    return {'index': index, 'follow': follow}
+
+
+@fragment('follow_button', 'posts/includes/follow_button.html')
+def follow_button(request, username):
+    return {
+        'username': username,
+        'following': request.user.username != username
+        and feeds.is_following(request.user, username),
+    }
+
+
+@fragment('edit_button', 'posts/includes/edit_button.html')
+def edit_button(request, post_id, author_id):
+    return {'post_id': post_id, 'author_id': author_id}
+
+
+@fragment('comment_form', 'includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'post_id': post_id, 'form': CommentForm()}
@@ -0,0 +1,104 @@
+import random
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.benchmark import Timer, temporary_databases
+from posts import counters, timeline
+from posts.models import Follow, Post, Timeline, User
+from posts.utils import POSTS_PER_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленту подписок в режимах pull, push и hybrid '
+        'на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--readers', type=int, default=200)
+        parser.add_argument(
+            '--threshold', type=int, default=None,
+            help='Порог подписчиков для hybrid, по умолчанию вдвое '
+                 'больше среднего числа подписчиков автора.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        threshold = options['threshold'] or max(
+            1, 2 * options['users'] * options['follows'] // options['authors']
+        )
+        strategies = (
+            ('pull', 0),
+            ('push', options['users'] + 1),
+            ('hybrid', threshold),
+        )
+        with temporary_databases(aliases={'default'}):
+            self.stdout.write(
+                f'{"distribution":<12} {"strategy":<8} '
+                f'{"write ms/post":>14} {"read ms/page":>13} '
+                f'{"read p95":>9} {"rows":>8}'
+            )
+            for distribution in ('uniform', 'skewed'):
+                users, authors = self.populate(options, distribution)
+                for name, value in strategies:
+                    write, read, rows = self.run(
+                        options, users, authors, value
+                    )
+                    self.stdout.write(
+                        f'{distribution:<12} {name:<8} '
+                        f'{write.mean_ms:>14.3f} {read.mean_ms:>13.3f} '
+                        f'{read.percentile_ms(95):>9.3f} {rows:>8}'
+                    )
+
+    def populate(self, options, distribution):
+        Post.objects.all().delete()
+        Follow.objects.all().delete()
+        User.objects.all().delete()
+        User.objects.bulk_create([
+            User(username=f'bench_user_{i}')
+            for i in range(options['users'])
+        ])
+        users = list(User.objects.order_by('pk'))
+        authors = users[:options['authors']]
+        if distribution == 'uniform':
+            weights = None
+        else:
+            weights = [1 / (rank + 1) ** 1.2 for rank in range(len(authors))]
+        follows = []
+        for user in users:
+            followed = set()
+            while len(followed) < min(options['follows'], len(authors)):
+                author, = self.random.choices(authors, weights)
+                if author != user:
+                    followed.add(author.pk)
+            follows.extend(
+                Follow(user=user, author_id=author_id)
+                for author_id in followed
+            )
+        Follow.objects.bulk_create(follows)
+        # bulk_create не шлет сигналов: счетчики подписчиков, по которым
+        # timeline выбирает стратегию, строятся пересчетом.
+        counters.repair()
+        return users, authors
+
+    def run(self, options, users, authors, threshold):
+        write, read = Timer(), Timer()
+        # Раскладка замеряется в самом запросе, без очереди задач.
+        with override_settings(
+            TIMELINE_CELEBRITY_THRESHOLD=threshold, JOB_QUEUE_EAGER=True
+        ):
+            Post.objects.all().delete()
+            for i in range(options['posts']):
+                author = self.random.choice(authors)
+                with write.measure():
+                    Post.objects.create(text=f'bench {i}', author=author)
+            for user in self.random.sample(users, options['readers']):
+                with read.measure():
+                    list(timeline.feed(user)[:POSTS_PER_PAGE])
+        return write, read, Timeline.objects.count()
@@ -0,0 +1,122 @@
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.core.management.base import BaseCommand
+from django.forms import ImageField
+from django.test.utils import override_settings
+from PIL import Image
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.images import ImageFile
+
+from core.uploads import HashingUploadHandler
+from core.workers import process_pool
+from posts import thumbnails
+from posts.forms import PostForm
+
+CHUNK_SIZE = 64 * 2 ** 10
+
+
+def peak_rss_mb():
+    # ru_maxrss переживает exec и хранит пик родителя, а VmHWM - нет.
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def upload(handler, path):
+    size = os.path.getsize(path)
+    handler.new_file('image', os.path.basename(path), 'image/jpeg', size)
+    with open(path, 'rb') as source:
+        start = 0
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            handler.receive_data_chunk(chunk, start)
+            start += len(chunk)
+    return handler.file_complete(size)
+
+
+def process(scenario, path, media_root):
+    """Принимает загрузку и готовит миниатюры в свежем процессе;
+    возвращает пиковый RSS до и после и время."""
+    idle = peak_rss_mb()
+    started = time.perf_counter()
+    if scenario == 'idle':
+        return idle, idle, 0.0
+    with override_settings(MEDIA_ROOT=media_root):
+        storage = FileSystemStorage()
+        if scenario == 'original':
+            file_ = ImageField().clean(
+                upload(TemporaryFileUploadHandler(), path)
+            )
+        else:
+            form = PostForm(
+                {'text': scenario},
+                {'image': upload(HashingUploadHandler(), path)},
+            )
+            form.is_valid()
+            file_ = form.cleaned_data['image']
+        name = storage.save(f'{scenario}.jpg', file_)
+        file_.close()
+        backend = ThumbnailBackend()
+        for geometry, options in thumbnails.PRESETS:
+            backend.get_thumbnail(
+                ImageFile(name, storage), geometry, **options
+            )
+        with storage.open(name) as source:
+            thumbnails.make_placeholder(source)
+    return idle, peak_rss_mb(), (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пиковую память процесса, принимающего большую '
+        'картинку: исходный путь с полным декодированием против '
+        'потоковой загрузки с проверкой заголовка и уменьшением.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, default=40)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            path = self.make_source(media_root, options['megapixels'])
+            self.stdout.write(
+                f'{options["megapixels"]:.0f} Мп, '
+                f'{os.path.getsize(path) / 2 ** 20:.1f} МБ; '
+                f'IMAGE_UPLOAD_MAX_SIDE={settings.IMAGE_UPLOAD_MAX_SIDE}'
+            )
+            self.stdout.write(
+                f'{"path":<10} {"peak MB":>9} {"+MB":>8} {"ms":>8}'
+            )
+            for scenario in ('idle', 'original', 'streamed'):
+                # Каждый сценарий - в новом процессе: пик RSS не сбросить.
+                with process_pool(1) as pool:
+                    idle, peak, elapsed = pool.submit(
+                        process, scenario, path, media_root
+                    ).result()
+                self.stdout.write(
+                    f'{scenario:<10} {peak:>9.1f} {peak - idle:>8.1f} '
+                    f'{elapsed:>8.0f}'
+                )
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def make_source(self, directory, megapixels):
+        width = round((megapixels * 10 ** 6 * 3 / 2) ** 0.5)
+        height = round(width * 2 / 3)
+        path = os.path.join(directory, 'source.jpg')
+        Image.linear_gradient('L').resize((width, height)).convert(
+            'RGB'
+        ).save(path, 'JPEG', quality=90)
+        return path
@@ -0,0 +1,83 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from PIL import Image
+
+from core.benchmark import Timer, temporary_databases
+from posts import feeds
+from posts.models import Group, Post, User
+from posts.utils import get_pages
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет рендер страницы ленты с холодным и прогретым кешем '
+        'карточек записей на временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=30)
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root), \
+                    temporary_databases(aliases={'default'}):
+                self.populate(options['posts'])
+                self.run(options['rounds'])
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def populate(self, count):
+        author = User.objects.create_user(
+            username='bench_author', first_name='Bench', last_name='Author'
+        )
+        group = Group.objects.create(title='Bench group', slug='bench')
+        for i in range(count):
+            image = BytesIO()
+            Image.new('RGB', (1200, 800), (i % 256, 80, 160)).save(
+                image, 'JPEG'
+            )
+            post = Post(text=f'bench {i}\nline', author=author, group=group)
+            post.image.save(
+                f'bench_{i}.jpg', ContentFile(image.getvalue()), save=False
+            )
+            post.save()
+
+    def render(self):
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        page_obj = get_pages(request, feeds.index())
+        list(page_obj)
+        return lambda: render_to_string(
+            'posts/index.html', {'page_obj': page_obj}, request=request
+        )
+
+    def run(self, rounds):
+        render = self.render()
+        # Миниатюры и хранилище sorl прогреваются заранее, чтобы замер
+        # показывал только стоимость рендера карточек.
+        render()
+        cold, warm = Timer(), Timer()
+        for _ in range(rounds):
+            cache.clear()
+            with cold.measure():
+                render()
+        for _ in range(rounds):
+            with warm.measure():
+                render()
+        self.stdout.write(f'{"cache":<6} {"ms/page":>9} {"p95":>9}')
+        for name, timer in (('cold', cold), ('warm', warm)):
+            self.stdout.write(
+                f'{name:<6} {timer.mean_ms:>9.3f} '
+                f'{timer.percentile_ms(95):>9.3f}'
+            )
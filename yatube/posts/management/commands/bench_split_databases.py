@@ -0,0 +1,189 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from threading import local
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, router
+from django.test import Client
+from django.urls import reverse
+
+from core.benchmark import Timer
+from core.workers import process_pool
+from yatube.settings_production import SQLITE_PRAGMAS
+
+BENCH_USER = 'bench_commenter'
+# Процессы стартуют одновременно: на запуск spawn с Django нужна пауза.
+START_DELAY = 3
+KV_KEYS = 1000
+
+
+def database(directory, name):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(directory, f'{name}.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    }
+
+
+def configure(databases):
+    """Подменяет DATABASES в свежем процессе, пока соединений нет."""
+    # Без debug toolbar: он занимает большую часть времени запроса.
+    settings.DEBUG = False
+    settings.DATABASES = databases
+    connections._databases = None
+    connections._connections = local()
+    connections.__dict__.pop('databases', None)
+    router.__dict__.pop('routers', None)
+
+
+def prepare(databases, commenters):
+    configure(databases)
+    from posts.models import Post, User
+
+    for alias in databases:
+        call_command('migrate', database=alias, verbosity=0)
+    author = User.objects.create_user(username='bench_author')
+    for number in range(commenters):
+        User.objects.create_user(username=f'{BENCH_USER}{number}')
+    return Post.objects.create(text='bench post', author=author).pk
+
+
+def comment(state):
+    response = state['client'].post(
+        state['url'], {'text': f'bench comment {state["rng"].random()}'}
+    )
+    if response.status_code != 302:
+        raise OperationalError(f'add_comment: {response.status_code}')
+
+
+def save_session(state):
+    session = state['session']
+    session['visits'] = session.get('visits', 0) + 1
+    session.save()
+
+
+def save_kv(state):
+    from sorl.thumbnail.models import KVStore
+
+    KVStore.objects.update_or_create(
+        key=f'bench||{state["rng"].randrange(KV_KEYS)}',
+        defaults={'value': f'{{"size": [{state["rng"].randrange(2000)}]}}'},
+    )
+
+
+OPERATIONS = {
+    'comment': comment,
+    'session': save_session,
+    'thumbnail': save_kv,
+}
+
+
+def run_client(role, number, databases, post_id, start, duration):
+    """Крутит операции одной роли до конца замера; возвращает роль,
+    времена успешных операций и число ошибок."""
+    configure(databases)
+    from django.contrib.sessions.backends.db import SessionStore
+    from posts.models import User
+
+    state = {'rng': random.Random(number)}
+    if role == 'comment':
+        state['client'] = Client()
+        state['client'].force_login(
+            User.objects.get(username=f'{BENCH_USER}{number}')
+        )
+        state['url'] = reverse('posts:add_comment', args=[post_id])
+    elif role == 'session':
+        state['session'] = SessionStore()
+        state['session'].create()
+    operation = OPERATIONS[role]
+    timer = Timer()
+    errors = 0
+    time.sleep(max(0, start - time.time()))
+    while time.time() < start + duration:
+        try:
+            with timer.measure():
+                operation(state)
+        except OperationalError:
+            errors += 1
+            timer.samples.pop()
+    return role, timer.samples, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку add_comment под смешанной нагрузкой записи '
+        'сессий и таблицы sorl: одна база SQLite против отдельных баз '
+        'для sessions и thumbnail.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--commenters', type=int, default=2)
+        parser.add_argument('--sessions', type=int, default=2)
+        parser.add_argument('--thumbnails', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"profile":<8} {"comments/s":>10} {"p50 ms":>8} '
+            f'{"p99 ms":>8} {"failed":>7} {"sessions/s":>10} {"kv/s":>8} '
+            f'{"failed":>7}'
+        )
+        for name in ('shared', 'split'):
+            directory = tempfile.mkdtemp()
+            try:
+                databases = {'default': database(directory, 'default')}
+                if name == 'split':
+                    for alias in set(settings.DATABASE_APPS_MAPPING.values()):
+                        databases[alias] = database(directory, alias)
+                self.report(name, self.run(databases, options))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, databases, options):
+        with process_pool(1) as pool:
+            post_id = pool.submit(
+                prepare, databases, options['commenters']
+            ).result()
+        roles = [
+            (role, number)
+            for role, count in (
+                ('comment', options['commenters']),
+                ('session', options['sessions']),
+                ('thumbnail', options['thumbnails']),
+            )
+            for number in range(count)
+        ]
+        start = time.time() + START_DELAY
+        with process_pool(len(roles)) as pool:
+            futures = [
+                pool.submit(
+                    run_client, role, number, databases, post_id, start,
+                    options['seconds'],
+                )
+                for role, number in roles
+            ]
+            results = [future.result() for future in futures]
+        timers = {role: Timer() for role in OPERATIONS}
+        errors = dict.fromkeys(OPERATIONS, 0)
+        for role, samples, role_errors in results:
+            timers[role].samples.extend(samples)
+            errors[role] += role_errors
+        return timers, errors, options['seconds']
+
+    def report(self, name, result):
+        timers, errors, seconds = result
+        comments = timers['comment']
+        self.stdout.write(
+            f'{name:<8} {len(comments.samples) / seconds:>10.0f} '
+            f'{comments.percentile_ms(50):>8.2f} '
+            f'{comments.percentile_ms(99):>8.2f} {errors["comment"]:>7} '
+            f'{len(timers["session"].samples) / seconds:>10.0f} '
+            f'{len(timers["thumbnail"].samples) / seconds:>8.0f} '
+            f'{errors["session"] + errors["thumbnail"]:>7}'
+        )
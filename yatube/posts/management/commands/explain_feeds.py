@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import feeds
+from posts.models import Comment, Follow, Group, Post, User
+from posts.utils import COMMENTS_PER_PAGE, POSTS_PER_PAGE
+
+BAD_PLAN_MARKERS = ('USE TEMP B-TREE',)
+
+
+def is_full_scan(line):
+    line = line.upper()
+    return line.lstrip(' -|`').startswith('SCAN') and 'USING' not in line
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает EXPLAIN QUERY PLAN для запросов каждой страницы и '
+        'помечает полные сканирования таблиц и сортировки во временном '
+        'B-дереве.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail', action='store_true',
+            help='Завершиться с ошибкой, если найден плохой план.'
+        )
+
+    def queries(self):
+        user = User(pk=1)
+        group = Group(pk=1, slug='group')
+        post = Post(pk=1)
+        page = slice(POSTS_PER_PAGE, POSTS_PER_PAGE * 2)
+        return (
+            ('index', feeds.index()[page]),
+            ('group_posts', feeds.group(group)[page]),
+            ('group_posts: group', Group.objects.filter(slug=group.slug)),
+            ('profile', feeds.profile(user)[page]),
+            ('profile: author', feeds.authors().filter(username='author')),
+            ('profile: following', Follow.objects.filter(
+                user=user, author__username='author')),
+            ('post_detail', feeds.post_detail().filter(pk=post.pk)),
+            ('post_detail: comments', feeds.comments(post.pk).order_by(
+                '-created', '-pk')[:COMMENTS_PER_PAGE]),
+            ('follow_index', feeds.follow(user)[page]),
+            ('follow_index: celebrities', Follow.objects.filter(
+                user=user, author__stats__followers_count__gte=1)),
+            ('follow_index: pulled author', Post.objects.filter(
+                author_id=user.pk).order_by('-pub_date', '-pk')[page]),
+            ('fan_out: followers', Follow.objects.filter(
+                author_id=user.pk).values_list('user_id', flat=True)),
+            ('add_comment', Comment.objects.filter(post_id=post.pk)),
+        )
+
+    def handle(self, *args, **options):
+        bad = []
+        for name, queryset in self.queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in queryset.explain().splitlines():
+                if is_full_scan(line) or any(
+                        marker in line for marker in BAD_PLAN_MARKERS):
+                    bad.append(name)
+                    line = self.style.ERROR(line)
+                self.stdout.write(f'  {line}')
+        if bad:
+            message = 'Плохие планы: ' + ', '.join(sorted(set(bad)))
+            if options['fail']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS('Все планы используют индексы.')
+            )
@@ -0,0 +1,36 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from core.workers import process_pool
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры всех геометрий для картинок существующих '
+        'записей в пуле процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов; 0 - готовить в этом процессе.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True).distinct()
+        )
+        if options['workers']:
+            with process_pool(options['workers']) as pool:
+                for _ in pool.map(thumbnails.generate, names, chunksize=8):
+                    pass
+        else:
+            for name in names:
+                thumbnails.generate(name)
+        self.stdout.write(
+            self.style.SUCCESS(f'Миниатюры готовы для {len(names)} картинок.')
+        )
@@ -0,0 +1,56 @@
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки записей из плоской папки posts/ в хранилище '
+        'по хешу содержимого, объединяя одинаковые файлы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-originals', action='store_true',
+            help='Не удалять старые файлы и их миниатюры после переноса.'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        names = [
+            name for name in Post.objects.exclude(image='').order_by(
+            ).values_list('image', flat=True).distinct()
+            if not storage.is_addressed(name)
+        ]
+        addressed = set()
+        missing = 0
+        for name in names:
+            try:
+                file_ = storage.open(name)
+            except (FileNotFoundError, SuspiciousFileOperation):
+                missing += 1
+                self.stderr.write(f'Нет файла {name}, запись пропущена.')
+                continue
+            with file_:
+                new_name = storage.save(name, file_)
+            posts = Post.objects.filter(image=name)
+            references = posts.count()
+            posts.update(image=new_name)
+            if references > 1:
+                storage.add_reference(new_name, references - 1)
+            addressed.add(new_name)
+            if not options['keep_originals']:
+                # Старые миниатюры строились от хранилища по умолчанию.
+                default.kvstore.delete_thumbnails(ImageFile(name))
+                storage.delete(name)
+            # Новое имя - новые миниатюры; generate заодно сбросит
+            # страницы, где были старые адреса.
+            thumbnails.generate(new_name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено {len(names) - missing} файлов, '
+            f'из них уникальных {len(addressed)}, пропущено {missing}.'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики записей, '
+        'комментариев и подписок.'
+    )
+
+    def handle(self, *args, **options):
+        counters.repair()
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
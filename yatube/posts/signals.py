@@ -0,0 +1,208 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_save
+)
+from django.dispatch import receiver
+
+from core import jobs
+from core.cache import invalidate_tags, tag
+from . import counters, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .utils import bump_count_version
+
+INDEX_FEED_TAG = 'feed:index'
+USER_LOGIN_FIELDS = frozenset({'last_login'})
+
+
+def group_tags(*group_ids):
+    return [
+        tag('group', slug)
+        for slug in Group.objects.filter(
+            pk__in=[pk for pk in group_ids if pk is not None]
+        ).values_list('slug', flat=True)
+    ]
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def reset_feed_counts(sender, instance, **kwargs):
+    bump_count_version()
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        jobs.enqueue(timeline.fan_out, instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        jobs.enqueue(timeline.backfill, instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    jobs.enqueue(timeline.prune, instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+def post_page_tags(post):
+    """Теги всех страниц, на которых видна запись."""
+    return [
+        INDEX_FEED_TAG,
+        tag('post', post.pk),
+        tag('author', post.author_id),
+        *group_tags(post.group_id, post._saved_group_id),
+    ]
+
+
+@receiver(post_init, sender=Post)
+def remember_saved_fields(sender, instance, **kwargs):
+    instance._saved_group_id = instance.group_id
+    instance._saved_image = instance.image.name
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user(instance.author_id, 'posts_count', 1)
+        counters.change_group(instance.group_id, 1)
+    elif instance._saved_group_id != instance.group_id:
+        counters.change_group(instance._saved_group_id, -1)
+        counters.change_group(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'posts_count', -1)
+    counters.change_group(instance._saved_group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    counters.change_post(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_user(instance.author_id, 'followers_count', 1)
+        counters.change_user(instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.change_user(instance.author_id, 'followers_count', -1)
+    counters.change_user(instance.user_id, 'following_count', -1)
+
+
+@receiver(post_delete, sender=Follow)
+def demote_author(sender, instance, **kwargs):
+    # Автор только что опустился ниже порога популярности.
+    followers = UserStats.objects.filter(pk=instance.author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    if followers == settings.TIMELINE_CELEBRITY_THRESHOLD - 1:
+        jobs.enqueue(timeline.demote, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    invalidate_tags(*post_page_tags(instance))
+
+
+def release_image(name):
+    """После коммита снимает ссылку записи на файл картинки."""
+    storage = Post._meta.get_field('image').storage
+    if name and storage.is_addressed(name):
+        transaction.on_commit(partial(storage.delete, name))
+
+
+@receiver(pre_save, sender=Post)
+def remember_upload(sender, instance, **kwargs):
+    # Повторная загрузка той же картинки дает то же имя, но новую ссылку.
+    instance._image_uploaded = (
+        bool(instance.image) and not instance.image._committed
+    )
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance._image_uploaded or (
+            instance.image.name != instance._saved_image):
+        release_image(instance._saved_image)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    release_image(instance._saved_image)
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw or not instance.image or (
+            instance.image.name == instance._saved_image):
+        return
+    transaction.on_commit(partial(thumbnails.schedule, instance.image.name))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, **kwargs):
+    invalidate_tags(tag('post', instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_pages(sender, instance, **kwargs):
+    invalidate_tags(
+        tag('author', instance.author_id),
+        tag('author', instance.user_id),
+    )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_pages(sender, instance, **kwargs):
+    invalidate_tags(INDEX_FEED_TAG, tag('group', instance.slug))
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_pages(sender, instance, created, update_fields=None,
+                            **kwargs):
+    if created or (update_fields and USER_LOGIN_FIELDS >= update_fields):
+        return
+    invalidate_tags(
+        INDEX_FEED_TAG,
+        tag('author', instance.pk),
+        *group_tags(*Post.objects.filter(author=instance).values_list(
+            'group_id', flat=True).distinct()),
+    )
+
+
+@receiver(post_save, sender=Post)
+def forget_saved_fields(sender, instance, **kwargs):
+    instance._saved_group_id = instance.group_id
+    instance._saved_image = instance.image.name
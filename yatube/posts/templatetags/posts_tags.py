@@ -0,0 +1,16 @@
+from django import template
+
+from posts import thumbnails
+from posts.utils import page_window as get_page_window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_window(page):
+    return get_page_window(page)
+
+
+@register.simple_tag
+def responsive_image(image):
+    return thumbnails.responsive(image)
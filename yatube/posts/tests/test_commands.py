@@ -0,0 +1,13 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feed_queries_use_indexes(self):
+        """Ни один запрос лент не сканирует таблицу целиком
+        и не сортирует во временном B-дереве."""
+        out = StringIO()
+        call_command('explain_feeds', '--fail', stdout=out)
+        self.assertIn('post_author_pub_date_idx', out.getvalue())
@@ -0,0 +1,86 @@
+from django.test import TestCase
+
+from posts import counters
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+
+
+TEST_USER = 'test_counters_user'
+TEST_AUTHOR = 'test_counters_author'
+TEST_POST_TEXT = 'Test post text'
+TEST_COMMENT_TEXT = 'Test comment text'
+GROUP_1_SLUG = 'test-counters-first'
+GROUP_2_SLUG = 'test-counters-second'
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USER)
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(title=GROUP_1_SLUG, slug=GROUP_1_SLUG)
+        cls.new_group = Group.objects.create(
+            title=GROUP_2_SLUG,
+            slug=GROUP_2_SLUG
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счетчики растут при создании и уменьшаются при удалении."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=self.author,
+            group=self.group
+        )
+        comment = Comment.objects.create(
+            post=post,
+            author=self.user,
+            text=TEST_COMMENT_TEXT
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_post_count(self):
+        """Смена группы записи переносит ее в счетчике другой группы."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=self.author,
+            group=self.group
+        )
+        post.group = self.new_group
+        post.save()
+        self.group.refresh_from_db()
+        self.new_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.new_group.posts_count, 1)
+
+    def test_repair_recomputes_counters(self):
+        """Команда пересчета чинит разъехавшиеся счетчики."""
+        Post.objects.bulk_create([
+            Post(text=TEST_POST_TEXT, author=self.author, group=self.group)
+            for _ in range(3)
+        ])
+        UserStats.objects.filter(user=self.user).delete()
+        counters.repair()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 3)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 3)
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 
@@ -35,6 +36,11 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
+SMALL_GIF_PATH = (
+    f'{POSTS_MEDIA_FOLDER}{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH[2:4]}/'
+    f'{SMALL_GIF_HASH}.gif'
+)
 
 PROFILE_URL = reverse('posts:profile', args=[TEST_USER])
 POST_CREATE_URL = reverse('posts:post_create')
@@ -107,11 +113,11 @@ class PostFormTest(TestCase):
         post = Post.objects.get(
             text=NEW_TEXT,
             group=self.post.group.id,
-            image=f'{POSTS_MEDIA_FOLDER}{TEST_IMAGE_NAME}'
+            image=SMALL_GIF_PATH
         )
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.group.id, form_data['group'])
-        self.assertEqual(post.image, f'{POSTS_MEDIA_FOLDER}{TEST_IMAGE_NAME}')
+        self.assertEqual(post.image, SMALL_GIF_PATH)
 
     def test_author_can_edit_post(self):
         """Автор поста может редактировать текст и менять группу."""
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job
+from posts import timeline
+from posts.models import Follow, Post, User
+
+TEST_AUTHOR = 'test_jobs_author'
+TEST_FOLLOWER = 'test_jobs_follower'
+TEST_POST_TEXT = 'Test post text'
+WORKER = 'test-worker'
+
+CALLS = []
+
+
+def record(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+def explode():
+    raise ValueError('boom')
+
+
+@override_settings(JOB_QUEUE_EAGER=False, JOB_MAX_ATTEMPTS=2)
+class JobQueueTest(TestCase):
+    def setUp(self):
+        CALLS.clear()
+
+    def run_next(self):
+        job_id = jobs.claim(WORKER)
+        self.assertIsNotNone(job_id)
+        jobs.execute(job_id)
+        return Job.objects.get(pk=job_id)
+
+    def run_all(self):
+        job_id = jobs.claim(WORKER)
+        while job_id is not None:
+            jobs.execute(job_id)
+            job_id = jobs.claim(WORKER)
+
+    def test_enqueue_waits_for_worker(self):
+        """Задача ждет воркера и выполняется с теми же аргументами."""
+        jobs.enqueue(record, 1, name='test')
+        self.assertEqual(CALLS, [])
+        job = self.run_next()
+        self.assertEqual(CALLS, [((1,), {'name': 'test'})])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+
+    def test_eager_runs_immediately(self):
+        """С JOB_QUEUE_EAGER задача выполняется сразу, без записи."""
+        with override_settings(JOB_QUEUE_EAGER=True):
+            jobs.enqueue(record, 1)
+        self.assertEqual(CALLS, [((1,), {})])
+        self.assertFalse(Job.objects.exists())
+
+    def test_job_is_claimed_once(self):
+        """Захваченную задачу другой воркер не получит."""
+        job = jobs.enqueue(record)
+        self.assertEqual(jobs.claim(WORKER), job.pk)
+        self.assertIsNone(jobs.claim('other-worker'))
+
+    def test_failed_job_retries_with_backoff(self):
+        """Упавшая задача повторяется позже, после последней попытки
+        помечается проваленной."""
+        job = jobs.enqueue(explode)
+        started = timezone.now()
+        job = self.run_next()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('ValueError: boom', job.error)
+        self.assertGreaterEqual(job.run_at, started + jobs.RETRY_DELAY)
+        self.assertIsNone(jobs.claim(WORKER))
+        Job.objects.filter(pk=job.pk).update(run_at=started)
+        job = self.run_next()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_stale_job_is_requeued(self):
+        """Задача упавшего воркера возвращается в очередь."""
+        job = jobs.enqueue(record)
+        jobs.claim(WORKER)
+        started = timezone.now() - jobs.RUNNING_TIMEOUT - timedelta(seconds=1)
+        Job.objects.filter(pk=job.pk).update(started=started)
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(self.run_next().status, Job.DONE)
+
+    def test_follow_fans_out_in_worker(self):
+        """Подписка раскладывает записи автора по ленте только
+        после выполнения задачи."""
+        author = User.objects.create_user(username=TEST_AUTHOR)
+        follower = User.objects.create_user(username=TEST_FOLLOWER)
+        post = Post.objects.create(text=TEST_POST_TEXT, author=author)
+        Follow.objects.create(user=follower, author=author)
+        self.assertEqual(list(timeline.feed(follower)), [])
+        self.run_all()
+        self.assertEqual(list(timeline.feed(follower)), [post])
+
+    def test_stats_command(self):
+        """jobs показывает глубину очереди и задержки по функциям."""
+        jobs.enqueue(record)
+        self.run_next()
+        jobs.enqueue(record)
+        out = StringIO()
+        call_command('jobs', stdout=out)
+        self.assertIn('ready: 1', out.getvalue())
+        self.assertIn(jobs.task_path(record), out.getvalue())
+
+
+@override_settings(JOB_QUEUE_EAGER=False)
+class RunWorkerTest(TransactionTestCase):
+    def test_runworker_drains_queue(self):
+        """runworker --once выполняет все готовые задачи и выходит."""
+        CALLS.clear()
+        for value in range(3):
+            jobs.enqueue(record, value)
+        call_command('runworker', '--once', stdout=StringIO())
+        self.assertEqual(sorted(CALLS), [((value,), {}) for value in range(3)])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 3)
@@ -0,0 +1,283 @@
+import math
+from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from core import cache as page_cache
+from posts import feeds
+from posts.models import Comment, Follow, Group, Post, User
+from posts.signals import INDEX_FEED_TAG
+
+TEST_AUTHOR = 'test_page_cache_author'
+TEST_READER = 'test_page_cache_reader'
+TEST_POST_TEXT = 'Test post text'
+CHANGED_TEXT = 'Changed test post text'
+CHANGED_NAME = 'Changedname'
+CHANGED_TITLE = 'Changed group title'
+GROUP_SLUG = 'test-page-cache-group'
+GROUP_TITLE = 'Test group title'
+INDEX_URL = reverse('posts:index')
+POST_CARD_TEMPLATE = 'includes/post_card.html'
+CHANGE_TIME = 1000000000.25
+VISITOR_PAGE_TAG = 'test-visitor-page'
+
+
+@page_cache.cache_page_tagged(60, [VISITOR_PAGE_TAG], 'test_visitor_page')
+def visitor_page(request):
+    return HttpResponse(f'Пользователь: {request.user.username}')
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def change_post_card(self):
+        """Меняет текст в обход сигналов и сбрасывает только фрагмент
+        карточки, не трогая теги страницы."""
+        Post.objects.filter(pk=self.post.pk).update(text=CHANGED_TEXT)
+        page_cache.invalidate_tags(page_cache.tag('post', self.post.pk))
+
+    def test_hit_is_counted(self):
+        """Повторный запрос отдается из кеша и считается попаданием."""
+        self.client.get(INDEX_URL)
+        self.client.get(INDEX_URL)
+        self.assertEqual(
+            page_cache.stats(),
+            {'hits': 1, 'stale': 0, 'regenerations': 1, 'not_modified': 0}
+        )
+
+    def test_stale_copy_is_served_while_locked(self):
+        """Пока страницу пересобирает другой процесс, отдается
+        устаревшая копия."""
+        response1 = self.client.get(INDEX_URL)
+        self.change_post_card()
+        page_cache.invalidate_tags(INDEX_FEED_TAG)
+        with mock.patch('core.cache.acquire_lock', return_value=False):
+            response2 = self.client.get(INDEX_URL)
+        self.assertEqual(response1.content, response2.content)
+        self.assertEqual(page_cache.stats()['stale'], 1)
+        response3 = self.client.get(INDEX_URL)
+        self.assertIn(CHANGED_TEXT, response3.content.decode())
+
+    def test_expired_copy_is_served_while_locked(self):
+        """Истекшая по времени страница тоже отдается, пока ее
+        пересобирают."""
+        self.client.get(INDEX_URL)
+        later = page_cache.time.time() + 60 * 60 * 5
+        with mock.patch('core.cache.time') as clock, \
+                mock.patch('core.cache.acquire_lock', return_value=False):
+            clock.time.return_value = later
+            self.client.get(INDEX_URL)
+        self.assertEqual(page_cache.stats()['stale'], 1)
+
+    def test_page_is_regenerated_early(self):
+        """Незадолго до истечения страница может пересобраться досрочно."""
+        self.client.get(INDEX_URL)
+        self.change_post_card()
+        with mock.patch('core.cache.EARLY_REFRESH_BETA', 10 ** 9):
+            response = self.client.get(INDEX_URL)
+        self.assertIn(CHANGED_TEXT, response.content.decode())
+        self.assertEqual(page_cache.stats()['regenerations'], 2)
+
+    def test_cache_stats_command(self):
+        """cache_stats --reset обнуляет счетчики."""
+        self.client.get(INDEX_URL)
+        call_command('cache_stats', '--reset', stdout=StringIO())
+        self.assertEqual(page_cache.stats()['regenerations'], 0)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.author)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        """Неизменившаяся страница отвечает 304 и по ETag,
+        и по Last-Modified, не выполняя запросов к базе."""
+        response = self.client.get(INDEX_URL)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        conditions = {
+            'HTTP_IF_NONE_MATCH': etag,
+            'HTTP_IF_MODIFIED_SINCE': last_modified,
+        }
+        for header, value in conditions.items():
+            with self.subTest(header=header), self.assertNumQueries(0):
+                response = self.client.get(INDEX_URL, **{header: value})
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED
+                )
+                self.assertEqual(response['ETag'], etag)
+                self.assertEqual(response['Last-Modified'], last_modified)
+
+    def test_last_modified_is_not_before_change(self):
+        """Last-Modified округляется вверх до целой секунды."""
+        request = RequestFactory().get(INDEX_URL)
+        _, last_modified = page_cache.validators(
+            request, TEST_POST_TEXT, CHANGE_TIME
+        )
+        self.assertEqual(last_modified, math.ceil(CHANGE_TIME))
+
+    def test_changed_page_is_sent_again(self):
+        """После нового комментария страница записи отдается заново."""
+        etag = self.client.get(self.POST_DETAIL_URL)['ETag']
+        Comment.objects.create(
+            post=self.post,
+            author=self.author,
+            text=TEST_POST_TEXT,
+        )
+        response = self.client.get(
+            self.POST_DETAIL_URL, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_validators_depend_on_visitor(self):
+        """У авторизованного посетителя свой ETag и нет Last-Modified."""
+        anonymous = self.client.get(INDEX_URL)
+        self.client.force_login(self.author)
+        response = self.client.get(
+            INDEX_URL, HTTP_IF_NONE_MATCH=anonymous['ETag']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+
+class UserFragmentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.reader = User.objects.create_user(username=TEST_READER)
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.author)
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.PROFILE_URL = reverse('posts:profile', args=[TEST_AUTHOR])
+
+    def setUp(self):
+        cache.clear()
+        page_cache.reset_stats()
+
+    def test_page_is_shared_by_visitors(self):
+        """Анонимы и авторизованные получают одну закешированную
+        страницу, а шапка у каждого своя."""
+        self.client.get(INDEX_URL)
+        self.client.force_login(self.reader)
+        response = self.client.get(INDEX_URL)
+        self.assertEqual(page_cache.stats()['hits'], 1)
+        content = response.content.decode()
+        self.assertIn(f'Пользователь: {TEST_READER}', content)
+        self.assertNotIn('<!--user-fragment:', content)
+
+    def test_follow_button_is_rendered_per_visitor(self):
+        """Кнопка подписки видна другим пользователям и следует
+        за подпиской, но не автору."""
+        self.client.force_login(self.author)
+        self.assertNotIn('Подписаться', self.client.get(
+            self.PROFILE_URL).content.decode())
+        self.client.force_login(self.reader)
+        self.assertIn('Подписаться', self.client.get(
+            self.PROFILE_URL).content.decode())
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertIn('Отписаться', self.client.get(
+            self.PROFILE_URL).content.decode())
+
+    def test_post_detail_buttons_are_rendered_per_visitor(self):
+        """Кнопка редактирования видна только автору, форма
+        комментария - только авторизованным."""
+        content = self.client.get(self.POST_DETAIL_URL).content.decode()
+        self.assertNotIn('Редактировать запись', content)
+        self.assertNotIn('csrfmiddlewaretoken', content)
+        self.client.force_login(self.reader)
+        content = self.client.get(self.POST_DETAIL_URL).content.decode()
+        self.assertNotIn('Редактировать запись', content)
+        self.assertIn('csrfmiddlewaretoken', content)
+        self.client.force_login(self.author)
+        content = self.client.get(self.POST_DETAIL_URL).content.decode()
+        self.assertIn('Редактировать запись', content)
+
+    def visitor_request(self, client):
+        """Запрос к visitor_page с сессией клиента, пропущенный через
+        SessionMiddleware и AuthenticationMiddleware."""
+        request = RequestFactory().get('/visitor-page/')
+        if settings.SESSION_COOKIE_NAME in client.cookies:
+            request.COOKIES[settings.SESSION_COOKIE_NAME] = (
+                client.cookies[settings.SESSION_COOKIE_NAME].value
+            )
+        SessionMiddleware().process_request(request)
+        AuthenticationMiddleware().process_request(request)
+        return SessionMiddleware().process_response(
+            request, visitor_page(request)
+        )
+
+    def test_visitor_page_is_not_shared(self):
+        """Страница, прочитавшая request.user, не попадает в общий кеш
+        и не достается анониму."""
+        self.client.force_login(self.author)
+        response = self.visitor_request(self.client)
+        self.assertIn(TEST_AUTHOR, response.content.decode())
+        response = self.visitor_request(self.client_class())
+        self.assertNotIn(TEST_AUTHOR, response.content.decode())
+        self.assertEqual(page_cache.stats()['hits'], 0)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(title=GROUP_TITLE, slug=GROUP_SLUG)
+        cls.post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def render_card(self):
+        return render_to_string(POST_CARD_TEMPLATE, {
+            'post': feeds.post_cards().get(pk=self.post.pk),
+            'show_author_profile_link': True,
+            'show_group': True,
+        })
+
+    def test_card_is_cached_until_post_changes(self):
+        """Карточка берется из кеша, пока запись не изменилась."""
+        card = self.render_card()
+        Post.objects.filter(pk=self.post.pk).update(text=CHANGED_TEXT)
+        self.assertEqual(self.render_card(), card)
+        post = Post.objects.get(pk=self.post.pk)
+        post.save()
+        self.assertIn(CHANGED_TEXT, self.render_card())
+
+    def test_card_is_invalidated_by_author_and_group(self):
+        """Смена имени автора или названия группы сбрасывает карточку."""
+        self.render_card()
+        self.author.first_name = CHANGED_NAME
+        self.author.save()
+        self.assertIn(CHANGED_NAME, self.render_card())
+        self.group.title = CHANGED_TITLE
+        self.group.save()
+        self.assertIn(CHANGED_TITLE, self.render_card())
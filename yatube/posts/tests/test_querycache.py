@@ -0,0 +1,92 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.querycache import QUERY_STATS
+from posts import feeds
+from posts.models import Comment, Group, Post, Timeline, User
+
+TEST_AUTHOR = 'test_querycache_author'
+TEST_POST_TEXT = 'Test post text'
+CHANGED_TEXT = 'Changed test post text'
+GROUP_SLUG = 'test-querycache-group'
+GROUP_TITLE = 'Test group title'
+CHANGED_TITLE = 'Changed group title'
+COMMENTS_COUNT = 5
+
+
+class QueryCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.group = Group.objects.create(title=GROUP_TITLE, slug=GROUP_SLUG)
+        cls.post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=cls.author,
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        QUERY_STATS.reset()
+
+    def test_cached_query_skips_database(self):
+        """Повторный запрос берется из кеша без обращения к базе."""
+        Group.objects.cached().get(slug=GROUP_SLUG)
+        with self.assertNumQueries(0):
+            group = Group.objects.cached().get(slug=GROUP_SLUG)
+        self.assertEqual(group, self.group)
+        stats = QUERY_STATS.values()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_uncached_query_hits_database(self):
+        """Без cached() запрос идет в базу, как раньше."""
+        Group.objects.get(slug=GROUP_SLUG)
+        with self.assertNumQueries(1):
+            Group.objects.get(slug=GROUP_SLUG)
+
+    def test_save_invalidates_table(self):
+        """Сохранение модели сбрасывает запросы к ее таблице."""
+        Group.objects.cached().get(slug=GROUP_SLUG)
+        self.group.title = CHANGED_TITLE
+        self.group.save()
+        group = Group.objects.cached().get(slug=GROUP_SLUG)
+        self.assertEqual(group.title, CHANGED_TITLE)
+        self.assertGreater(QUERY_STATS.values()['invalidations'], 0)
+
+    def test_update_invalidates_table(self):
+        """update() в обход сигналов тоже сбрасывает кеш таблицы."""
+        texts = Post.objects.filter(pk=self.post.pk).values_list(
+            'text', flat=True
+        )
+        list(texts.cached())
+        Post.objects.filter(pk=self.post.pk).update(text=CHANGED_TEXT)
+        self.assertEqual(list(texts.cached()), [CHANGED_TEXT])
+
+    def test_joined_table_invalidates_query(self):
+        """Запрос сбрасывается и изменением присоединенной таблицы."""
+        author = feeds.authors().cached().get(username=TEST_AUTHOR)
+        self.assertEqual(author.stats.posts_count, 1)
+        Post.objects.create(text=TEST_POST_TEXT, author=self.author)
+        author = feeds.authors().cached().get(username=TEST_AUTHOR)
+        self.assertEqual(author.stats.posts_count, 2)
+
+    def test_bulk_delete_invalidates_once(self):
+        """Удаление многих строк сбрасывает каждую таблицу один раз:
+        комментарии и записи с их счетчиками."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.author, text=TEST_POST_TEXT)
+            for _ in range(COMMENTS_COUNT)
+        )
+        comments = Comment.objects.filter(post=self.post)
+        self.assertEqual(len(comments.cached()), COMMENTS_COUNT)
+        QUERY_STATS.reset()
+        comments.delete()
+        self.assertEqual(QUERY_STATS.values()['invalidations'], 2)
+        self.assertEqual(list(comments.cached()), [])
+
+    def test_uncached_model_is_deleted_fast(self):
+        """Модели без кеша запросов удаляются одним DELETE без SELECT."""
+        with self.assertNumQueries(1):
+            Timeline.objects.filter(user=self.author).delete()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase
+
+from core import routers
+from core.middleware import REPLICA_PIN_COOKIE, ReplicaMiddleware
+from posts.models import Post, User
+
+TEST_AUTHOR = 'test_replica_author'
+TEST_POST_TEXT = 'Test post text'
+REPLICA = routers.REPLICA_DB_ALIAS
+
+
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(
+            routers, 'replica_enabled', return_value=True
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.router = routers.ReplicaRouter()
+        routers.mark_synced(time.time())
+
+    def read_alias_after(self, view):
+        """Алиас чтения в конце запроса и сам ответ."""
+        aliases = []
+
+        def get_response(request):
+            view()
+            aliases.append(self.router.db_for_read(Post))
+            return HttpResponse()
+
+        response = ReplicaMiddleware(get_response)(self.request)
+        return aliases[0], response
+
+    def test_get_reads_synced_replica(self):
+        """GET-запрос читает синхронизированную реплику."""
+        self.request = RequestFactory().get('/')
+        alias, response = self.read_alias_after(lambda: None)
+        self.assertEqual(alias, REPLICA)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_stale_replica_is_skipped(self):
+        """Отставшая от тегов страницы реплика не читается."""
+        with routers.replica_reads(), \
+                routers.fresh_after(time.time() + 1):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_request_reads_own_writes(self):
+        """После записи запрос читает основную базу, а следующие
+        запросы посетителя закреплены за ней кукой до синхронизации
+        реплики."""
+        self.request = RequestFactory().get('/')
+        alias, response = self.read_alias_after(
+            lambda: self.router.db_for_write(Post)
+        )
+        self.assertEqual(alias, 'default')
+        written = response.cookies[REPLICA_PIN_COOKIE].value
+        self.request = RequestFactory().get('/')
+        self.request.COOKIES[REPLICA_PIN_COOKIE] = written
+        alias, response = self.read_alias_after(lambda: None)
+        self.assertEqual(alias, 'default')
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        routers.mark_synced(float(written) + 1)
+        alias, response = self.read_alias_after(lambda: None)
+        self.assertEqual(alias, REPLICA)
+        self.assertEqual(response.cookies[REPLICA_PIN_COOKIE].value, '')
+
+    def test_unsynced_replica_is_skipped(self):
+        """Без времени синхронизации реплика не читается."""
+        cache.delete(routers.SYNCED_AT_KEY)
+        self.request = RequestFactory().get('/')
+        alias, _ = self.read_alias_after(lambda: None)
+        self.assertEqual(alias, 'default')
+
+    def test_post_requests_read_primary(self):
+        """Запросы, меняющие данные, реплику не читают."""
+        self.request = RequestFactory().post('/')
+        alias, _ = self.read_alias_after(lambda: None)
+        self.assertEqual(alias, 'default')
+
+
+# backup ждет, пока источник не выйдет из транзакции TestCase.
+class SyncReplicaTest(TransactionTestCase):
+    def test_sync_copies_database(self):
+        """sync_replica копирует основную базу и отмечает время копии."""
+        author = User.objects.create_user(username=TEST_AUTHOR)
+        Post.objects.create(text=TEST_POST_TEXT, author=author)
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        started = time.time()
+        with mock.patch.dict(settings.DATABASES, {REPLICA: {'NAME': path}}):
+            call_command('sync_replica', stdout=StringIO())
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute(
+                'SELECT text FROM posts_post WHERE author_id = ?',
+                (author.pk,)
+            ).fetchall(),
+            [(TEST_POST_TEXT,)]
+        )
+        self.assertGreaterEqual(routers.synced_at(), started)
@@ -0,0 +1,33 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.test import SimpleTestCase
+from sorl.thumbnail.models import KVStore
+
+from core.routers import AppDatabaseRouter
+from posts.models import Post
+
+SESSIONS_DB = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}
+
+
+class AppDatabaseRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = AppDatabaseRouter()
+
+    def test_unconfigured_apps_stay_in_default(self):
+        """Пока алиас не настроен, сессии живут в основной базе."""
+        self.assertIsNone(self.router.db_for_write(Session))
+        self.assertIsNone(self.router.allow_migrate('default', 'sessions'))
+
+    def test_configured_apps_get_own_database(self):
+        """Сессии читаются, пишутся и мигрируют только в своей базе,
+        остальные таблицы туда не попадают."""
+        with mock.patch.dict(settings.DATABASES, {'sessions': SESSIONS_DB}):
+            self.assertEqual(self.router.db_for_read(Session), 'sessions')
+            self.assertEqual(self.router.db_for_write(Session), 'sessions')
+            self.assertIsNone(self.router.db_for_write(Post))
+            self.assertIsNone(self.router.db_for_write(KVStore))
+            self.assertTrue(self.router.allow_migrate('sessions', 'sessions'))
+            self.assertFalse(self.router.allow_migrate('default', 'sessions'))
+            self.assertFalse(self.router.allow_migrate('sessions', 'posts'))
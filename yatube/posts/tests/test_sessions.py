@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import User
+
+TEST_USER = 'test_sessions_user'
+OLD_PASSWORD = 'Old-password-123'
+NEW_PASSWORD = 'New-password-456'
+
+
+class CachedSessionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username=TEST_USER, password=OLD_PASSWORD
+        )
+        self.client.force_login(self.user)
+
+    def request_user(self, client):
+        """Пользователь запроса с сессией этого клиента, как его видят
+        SessionMiddleware и AuthenticationMiddleware."""
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.SESSION_COOKIE_NAME] = (
+            client.cookies[settings.SESSION_COOKIE_NAME].value
+        )
+        SessionMiddleware().process_request(request)
+        AuthenticationMiddleware().process_request(request)
+        return request
+
+    def db_session(self):
+        return Session.objects.get(
+            session_key=self.client.session.session_key
+        ).get_decoded()
+
+    def test_warm_request_makes_no_queries(self):
+        """Повторный запрос узнает пользователя без запросов к базе."""
+        self.assertEqual(self.request_user(self.client).user, self.user)
+        with self.assertNumQueries(0):
+            request = self.request_user(self.client)
+            self.assertEqual(request.user, self.user)
+
+    def test_changes_reach_database_later(self):
+        """Изменения сессии, кроме входа, пишутся в базу не сразу."""
+        session = self.client.session
+        session['seen'] = True
+        session.save()
+        self.assertEqual(self.client.session['seen'], True)
+        self.assertNotIn('seen', self.db_session())
+        with override_settings(SESSION_WRITE_BEHIND_SECONDS=0):
+            session = self.client.session
+            session.save()
+        self.assertEqual(self.db_session()['seen'], True)
+
+    def test_login_survives_cache_loss(self):
+        """Без кеша сессия и вход читаются из базы."""
+        cache.clear()
+        self.assertEqual(self.request_user(self.client).user, self.user)
+
+    def test_password_change_logs_out_other_sessions(self):
+        """Смена пароля завершает другие сессии, но не текущую."""
+        other = Client()
+        other.force_login(self.user)
+        self.assertEqual(self.request_user(other).user, self.user)
+        response = self.client.post(reverse('users:password_change'), {
+            'old_password': OLD_PASSWORD,
+            'new_password1': NEW_PASSWORD,
+            'new_password2': NEW_PASSWORD,
+        })
+        self.assertRedirects(response, reverse('users:password_change_done'))
+        self.assertFalse(self.request_user(other).user.is_authenticated)
+        self.assertEqual(self.request_user(self.client).user, self.user)
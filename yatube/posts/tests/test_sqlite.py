@@ -0,0 +1,38 @@
+import shutil
+import tempfile
+
+from django.db import connections
+from django.test import SimpleTestCase
+
+from core.db import configure_sqlite
+
+TEST_PRAGMAS = {'journal_mode': 'WAL', 'cache_size': -1234}
+
+
+class SqlitePragmasTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        settings_dict = {
+            **connections['default'].settings_dict,
+            'NAME': f'{directory}/test.sqlite3',
+            'PRAGMAS': TEST_PRAGMAS,
+        }
+        self.connection = type(connections['default'])(settings_dict)
+        self.addCleanup(self.connection.close)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_new_connection_gets_pragmas(self):
+        """Новое соединение получает PRAGMA из настроек базы."""
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('cache_size'), -1234)
+
+    def test_other_backends_are_skipped(self):
+        """Соединения не SQLite хук не трогает."""
+        self.connection.vendor = 'postgresql'
+        self.connection.connection = None
+        configure_sqlite(None, self.connection)
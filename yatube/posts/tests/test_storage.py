@@ -0,0 +1,121 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Хранилище ключей sorl тестов не трогает настоящее.
+THUMBNAIL_CACHES = {
+    **settings.CACHES,
+    'thumbnails': {
+        'BACKEND': 'core.kvstore.ThumbnailCache',
+        'LOCATION': os.path.join(TEMP_MEDIA_ROOT, 'kvstore'),
+    },
+}
+
+TEST_AUTHOR = 'test_storage_author'
+TEST_POST_TEXT = 'Test post text'
+TEST_IMAGE_NAME = 'posts/photo.gif'
+LEGACY_IMAGE_NAME = 'posts/legacy.gif'
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def make_image():
+    return SimpleUploadedFile('photo.gif', SMALL_GIF, 'image/gif')
+
+
+def run_on_commit(func, using=None):
+    func()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, CACHES=THUMBNAIL_CACHES
+)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.storage = Post._meta.get_field('image').storage
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, image):
+        return Post.objects.create(
+            text=TEST_POST_TEXT, author=self.author, image=image
+        )
+
+    def test_file_is_named_by_content_hash(self):
+        """Файл лежит в подпапках по началу хеша содержимого."""
+        name = self.storage.save(TEST_IMAGE_NAME, ContentFile(SMALL_GIF))
+        self.assertTrue(self.storage.is_addressed(name))
+        self.assertRegex(name, r'^posts/(\w{2})/(\w{2})/\1\2\w{60}\.gif$')
+        self.assertFalse(self.storage.is_addressed(TEST_IMAGE_NAME))
+        with self.storage.open(name) as file_:
+            self.assertEqual(file_.read(), SMALL_GIF)
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые загрузки хранятся одной копией с двумя ссылками."""
+        first = self.create_post(make_image())
+        second = self.create_post(make_image())
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(
+            StoredFile.objects.get(name=first.image.name).references, 2
+        )
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл удаляется вместе с последней ссылающейся записью."""
+        first = self.create_post(make_image())
+        second = self.create_post(make_image())
+        name = first.image.name
+        with mock.patch(
+            'django.db.transaction.on_commit', run_on_commit
+        ):
+            first.delete()
+            self.assertTrue(self.storage.exists(name))
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_legacy_files_are_migrated(self):
+        """migrate_post_images переносит старые файлы и сводит дубликаты
+        к одному."""
+        legacy_storage = FileSystemStorage()
+        names = [
+            legacy_storage.save(LEGACY_IMAGE_NAME, ContentFile(SMALL_GIF))
+            for _ in range(2)
+        ]
+        posts = [self.create_post(name) for name in names]
+        call_command('migrate_post_images', stdout=StringIO())
+        for post in posts:
+            post.refresh_from_db()
+        self.assertEqual(posts[0].image.name, posts[1].image.name)
+        self.assertTrue(self.storage.is_addressed(posts[0].image.name))
+        self.assertTrue(self.storage.exists(posts[0].image.name))
+        self.assertEqual(
+            StoredFile.objects.get(name=posts[0].image.name).references, 2
+        )
+        for name in names:
+            with self.subTest(name=name):
+                self.assertFalse(legacy_storage.exists(name))
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.models import KVStore
+
+from core import jobs
+from core.models import Job
+from posts import feeds, thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Хранилище ключей sorl тестов не трогает настоящее.
+THUMBNAIL_CACHES = {
+    **settings.CACHES,
+    'thumbnails': {
+        'BACKEND': 'core.kvstore.ThumbnailCache',
+        'LOCATION': os.path.join(TEMP_MEDIA_ROOT, 'kvstore'),
+    },
+}
+
+TEST_AUTHOR = 'test_thumbnails_author'
+TEST_POST_TEXT = 'Test post text'
+POST_CARD_TEMPLATE = 'includes/post_card.html'
+KV_KEY_PREFIX = 'sorl-thumbnail||'
+TEST_KV_KEY = KV_KEY_PREFIX + 'image||test'
+TEST_KV_VALUE = '{"name": "test.jpg", "size": [1, 1]}'
+
+
+def make_image(name='photo.jpg'):
+    image = BytesIO()
+    Image.new('RGB', (1200, 800), (30, 90, 150)).save(image, 'JPEG')
+    return SimpleUploadedFile(name, image.getvalue(), 'image/jpeg')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, CACHES=THUMBNAIL_CACHES
+)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        default.kvstore.clear()
+        self.post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=self.author,
+            image=make_image(),
+        )
+
+    def render_card(self):
+        return render_to_string(POST_CARD_TEMPLATE, {
+            'post': feeds.post_cards().get(pk=self.post.pk),
+        })
+
+    def test_render_does_not_generate_thumbnails(self):
+        """Без готовой миниатюры карточка показывает исходную картинку
+        и ничего не ресайзит."""
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            card = self.render_card()
+        get_image.assert_not_called()
+        self.assertIn(self.post.image.url, card)
+
+    @override_settings(JOB_QUEUE_EAGER=False)
+    def test_render_schedules_missing_thumbnails(self):
+        """Без сразу выполняемой очереди рендер ставит подготовку
+        миниатюр в очередь."""
+        self.render_card()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_clear_command_empties_store(self):
+        """thumbnail clear удаляет все ключи sorl из хранилища."""
+        thumbnails.generate(self.post.image.name)
+        call_command('thumbnail', 'clear', verbosity=0)
+        self.assertEqual(default.kvstore._find_keys_raw(KV_KEY_PREFIX), [])
+
+    def test_generate_replaces_original_in_card(self):
+        """После подготовки миниатюр карточка сразу показывает миниатюру."""
+        self.render_card()
+        thumbnails.generate(self.post.image.name)
+        card = self.render_card()
+        self.assertNotIn(self.post.image.url, card)
+        self.assertIn(settings.MEDIA_URL + 'cache/', card)
+
+    def test_card_has_responsive_variants_and_placeholder(self):
+        """Карточка получает srcset всех ширин, ленивую загрузку и
+        размытое превью, сохраненное в записи."""
+        thumbnails.generate(self.post.image.name)
+        self.post.refresh_from_db()
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+        card = self.render_card()
+        for width in thumbnails.CARD_WIDTHS:
+            with self.subTest(width=width):
+                self.assertIn(f' {width}w', card)
+        self.assertIn('loading="lazy"', card)
+        self.assertIn(self.post.image_placeholder, card)
+
+    def test_prefetched_card_does_not_touch_store(self):
+        """Внутри prefetched карточка берет миниатюры из памяти,
+        не обращаясь ни к кешу, ни к базе."""
+        thumbnails.generate(self.post.image.name)
+        post = feeds.post_cards().get(pk=self.post.pk)
+        store = default.kvstore.cache
+        with thumbnails.prefetched([post]), \
+                mock.patch.object(store, 'get', wraps=store.get) as get, \
+                self.assertNumQueries(0):
+            card = render_to_string(POST_CARD_TEMPLATE, {'post': post})
+        self.assertFalse([
+            call for call in get.call_args_list
+            if call[0][0].startswith(KV_KEY_PREFIX)
+        ])
+        self.assertIn(settings.MEDIA_URL + 'cache/', card)
+
+    def test_kvstore_is_migrated_from_database(self):
+        """Записи sorl переносятся из базы в кеш."""
+        KVStore.objects.create(key=TEST_KV_KEY, value=TEST_KV_VALUE)
+        call_command(
+            'migrate_thumbnail_kvstore', '--delete', stdout=StringIO()
+        )
+        self.assertEqual(default.kvstore._get_raw(TEST_KV_KEY), TEST_KV_VALUE)
+        self.assertFalse(KVStore.objects.filter(key=TEST_KV_KEY).exists())
+
+    def test_schedule_submits_image_once(self):
+        """Картинка, уже стоящая в очереди, повторно не отправляется."""
+        with override_settings(JOB_QUEUE_EAGER=False):
+            thumbnails.schedule(self.post.image.name)
+            thumbnails.schedule(self.post.image.name)
+        self.assertEqual(
+            list(Job.objects.values_list('task', 'payload')),
+            [(jobs.task_path(thumbnails.generate),
+              jobs.encode([self.post.image.name], {}))],
+        )
+
+    def test_backfill_command(self):
+        """generate_thumbnails готовит миниатюры существующих записей."""
+        call_command(
+            'generate_thumbnails', '--workers', '0', stdout=StringIO()
+        )
+        self.assertIn(settings.MEDIA_URL + 'cache/', self.render_card())
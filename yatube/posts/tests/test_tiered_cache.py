@@ -0,0 +1,121 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.tiered_cache import TieredCache
+
+TEST_KEY = 'test-key'
+OTHER_KEY = 'other-key'
+COUNTER_KEY = 'counter:test'
+L2_ONLY_PREFIX = 'counter:'
+EXPIRING_TIMEOUT = 10
+INCREMENTS = 50
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        # Два экземпляра с общим каталогом - как два воркера gunicorn.
+        self.worker1 = self.make_cache()
+        self.worker2 = self.make_cache()
+
+    def make_cache(self):
+        return TieredCache(self.location, {
+            'OPTIONS': {'L2_ONLY_PREFIXES': (L2_ONLY_PREFIX,)},
+        })
+
+    def test_value_is_shared_between_workers(self):
+        """Значение, записанное одним процессом, видно другому."""
+        self.worker1.set(TEST_KEY, 1)
+        self.assertEqual(self.worker2.get(TEST_KEY), 1)
+
+    def test_second_read_hits_l1(self):
+        """Повторное чтение обслуживает L1."""
+        self.worker1.set(TEST_KEY, 1)
+        self.worker2.get(TEST_KEY)
+        self.worker2.get(TEST_KEY)
+        stats = self.worker2.stats()
+        self.assertEqual(stats['l1_hits'], 1)
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l1_hit_rate'], 0.5)
+
+    def test_invalidation_reaches_other_workers(self):
+        """Запись и удаление в одном процессе сбрасывают L1 другого."""
+        self.worker1.set(TEST_KEY, 1)
+        self.assertEqual(self.worker2.get(TEST_KEY), 1)
+        self.worker1.set(TEST_KEY, 2)
+        self.assertEqual(self.worker2.get(TEST_KEY), 2)
+        self.worker1.delete(TEST_KEY)
+        self.assertIsNone(self.worker2.get(TEST_KEY))
+
+    def test_write_keeps_other_keys_in_l1(self):
+        """Запись одного ключа не сбрасывает из L1 другие."""
+        self.worker1.set(TEST_KEY, 1)
+        self.worker2.get(TEST_KEY)
+        self.worker1.set(OTHER_KEY, 2)
+        self.worker1.add('new-key', 3)
+        self.worker2.get(TEST_KEY)
+        self.assertEqual(self.worker2.stats()['l1_hits'], 1)
+
+    def test_l1_is_bounded(self):
+        """L1 вытесняет давно не использованные значения."""
+        worker = TieredCache(self.location, {
+            'OPTIONS': {'L1_MAX_ENTRIES': 2},
+        })
+        worker.set_many({'a': 1, 'b': 2, 'c': 3})
+        worker.get_many(['a', 'b', 'c'])
+        self.assertEqual(len(worker._l1), 2)
+
+    def test_add_is_atomic(self):
+        """add удается только одному процессу."""
+        self.assertTrue(self.worker1.add(TEST_KEY, 1))
+        self.assertFalse(self.worker2.add(TEST_KEY, 2))
+        self.assertEqual(self.worker2.get(TEST_KEY), 1)
+
+    def test_add_replaces_expired_value_once(self):
+        """Просроченное значение заменяет только первый add."""
+        self.worker1.set(TEST_KEY, 1, -1)
+        self.assertTrue(self.worker1.add(TEST_KEY, 2))
+        self.assertFalse(self.worker2.add(TEST_KEY, 3))
+        self.assertEqual(self.worker2.get(TEST_KEY), 2)
+
+    def test_l1_respects_l2_expiry(self):
+        """Значение не живет в L1 дольше, чем в общем уровне."""
+        self.worker1.set(TEST_KEY, 1, EXPIRING_TIMEOUT)
+        self.assertEqual(self.worker2.get(TEST_KEY), 1)
+        expired = time.time() + EXPIRING_TIMEOUT + 1
+        with mock.patch('time.time', return_value=expired):
+            self.assertIsNone(self.worker2.get(TEST_KEY))
+
+    def test_concurrent_incr_loses_nothing(self):
+        """Одновременные incr из разных процессов складываются."""
+        self.worker1.set(COUNTER_KEY, 0)
+
+        def increment(worker):
+            for _ in range(INCREMENTS):
+                worker.incr(COUNTER_KEY)
+
+        threads = [
+            threading.Thread(target=increment, args=(worker,))
+            for worker in (self.worker1, self.worker2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.worker1.get(COUNTER_KEY), 2 * INCREMENTS)
+
+    def test_l2_only_keys_skip_l1(self):
+        """Счетчики не попадают в L1 и не сбрасывают его."""
+        self.worker1.set(TEST_KEY, 1)
+        self.worker2.get(TEST_KEY)
+        self.worker1.set(COUNTER_KEY, 0)
+        self.worker1.incr(COUNTER_KEY)
+        self.assertEqual(self.worker2.get(COUNTER_KEY), 1)
+        self.worker2.get(TEST_KEY)
+        self.assertEqual(self.worker2.stats()['l1_hits'], 1)
@@ -0,0 +1,125 @@
+from django.test import TestCase, override_settings
+
+from posts import timeline
+from posts.models import Follow, Post, Timeline, User
+
+
+TEST_USER = 'test_timeline_reader'
+TEST_AUTHOR = 'test_timeline_author'
+TEST_OTHER_AUTHOR = 'test_timeline_other'
+TEST_FOLLOWER = 'test_timeline_follower'
+TEST_POST_TEXT = 'Test post text'
+TIMELINE_MAX_LENGTH = 3
+CELEBRITY_THRESHOLD = 2
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USER)
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.other_author = User.objects.create_user(
+            username=TEST_OTHER_AUTHOR
+        )
+
+    def create_posts(self, author, count):
+        return [
+            Post.objects.create(text=f'{TEST_POST_TEXT} {i}', author=author)
+            for i in range(count)
+        ]
+
+    def test_new_post_is_pushed_to_followers(self):
+        """Новая запись попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post, = self.create_posts(self.author, 1)
+        self.create_posts(self.other_author, 1)
+        self.assertEqual(list(timeline.feed(self.user)), [post])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые записи автора, отписка убирает их."""
+        posts = self.create_posts(self.author, 2)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(list(timeline.feed(self.user)), posts[::-1])
+        follow.delete()
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+
+    @override_settings(TIMELINE_MAX_LENGTH=TIMELINE_MAX_LENGTH)
+    def test_timeline_length_is_capped(self):
+        """Лента хранит не больше TIMELINE_MAX_LENGTH последних записей."""
+        Follow.objects.create(user=self.user, author=self.author)
+        posts = self.create_posts(self.author, TIMELINE_MAX_LENGTH + 2)
+        self.assertEqual(
+            list(timeline.feed(self.user)),
+            posts[::-1][:TIMELINE_MAX_LENGTH]
+        )
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=CELEBRITY_THRESHOLD)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Записи популярного автора не раскладываются по лентам,
+        но попадают в ленту подписок при чтении в правильном порядке."""
+        follower = User.objects.create_user(username=TEST_FOLLOWER)
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other_author)
+        posts = []
+        for _ in range(2):
+            posts += self.create_posts(self.author, 1)
+            posts += self.create_posts(self.other_author, 1)
+        self.assertFalse(
+            Timeline.objects.filter(author=self.author).exists()
+        )
+        feed = timeline.feed(self.user)
+        self.assertIsInstance(feed, timeline.HybridFeed)
+        self.assertEqual(feed.count(), len(posts))
+        self.assertEqual(feed[0:10], posts[::-1])
+        self.assertEqual(feed[1:3], posts[::-1][1:3])
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=CELEBRITY_THRESHOLD)
+    def test_deep_slices_of_pulled_posts(self):
+        """Дальние срезы ленты с популярным автором сливаются верно."""
+        follower = User.objects.create_user(username=TEST_FOLLOWER)
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other_author)
+        posts = []
+        for _ in range(4):
+            posts += self.create_posts(self.author, 2)
+            posts += self.create_posts(self.other_author, 1)
+        feed = timeline.feed(self.user)
+        for start in range(0, len(posts), 2):
+            with self.subTest(start=start):
+                self.assertEqual(
+                    feed[start:start + 2], posts[::-1][start:start + 2]
+                )
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=CELEBRITY_THRESHOLD)
+    def test_open_and_negative_slices(self):
+        """Срез без конца отдает ленту до конца, отрицательные индексы
+        дают понятную ошибку."""
+        follower = User.objects.create_user(username=TEST_FOLLOWER)
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=follower, author=self.author)
+        Follow.objects.create(user=self.user, author=self.other_author)
+        posts = self.create_posts(self.author, 3)
+        posts += self.create_posts(self.other_author, 2)
+        feed = timeline.feed(self.user)
+        self.assertIsInstance(feed, timeline.HybridFeed)
+        self.assertEqual(feed[2:], posts[::-1][2:])
+        self.assertEqual(feed[1], posts[::-1][1])
+        for index in (-1, slice(-2, None), slice(0, -1)):
+            with self.subTest(index=index):
+                with self.assertRaises(ValueError):
+                    feed[index]
+
+    @override_settings(TIMELINE_CELEBRITY_THRESHOLD=CELEBRITY_THRESHOLD)
+    def test_demoted_author_posts_stay_in_feed(self):
+        """Записи автора, переставшего быть популярным, остаются
+        в лентах подписчиков."""
+        follower = User.objects.create_user(username=TEST_FOLLOWER)
+        Follow.objects.create(user=self.user, author=self.author)
+        follow = Follow.objects.create(user=follower, author=self.author)
+        post, = self.create_posts(self.author, 1)
+        self.assertFalse(Timeline.objects.filter(post=post).exists())
+        follow.delete()
+        self.assertEqual(list(timeline.feed(self.user)), [post])
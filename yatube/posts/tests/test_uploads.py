@@ -0,0 +1,102 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image, ImageFile
+
+from core.uploads import HashingUploadHandler
+from posts.forms import PostForm
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+TEST_USER = 'test_uploads'
+TEST_POST_TEXT = 'Test post text'
+LARGE_SIZE = (3000, 1000)
+SMALL_SIZE = (100, 100)
+POST_CREATE_URL = reverse('posts:post_create')
+
+
+def make_image(size, image_format='JPEG', name='photo.jpg'):
+    image = BytesIO()
+    Image.new('RGB', size, (30, 90, 150)).save(image, image_format)
+    return SimpleUploadedFile(name, image.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USER)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def make_form(self, image):
+        return PostForm({'text': TEST_POST_TEXT}, {'image': image})
+
+    def test_large_image_is_downscaled(self):
+        """Картинка крупнее IMAGE_UPLOAD_MAX_SIDE сохраняется уменьшенной."""
+        self.client.post(POST_CREATE_URL, {
+            'text': TEST_POST_TEXT,
+            'image': make_image(LARGE_SIZE),
+        })
+        post = Post.objects.get(author=self.user)
+        self.assertEqual(
+            max(post.image.width, post.image.height),
+            settings.IMAGE_UPLOAD_MAX_SIDE
+        )
+
+    def test_decompression_bomb_is_rejected_by_header(self):
+        """Слишком большой кадр отклоняется без декодирования пикселей."""
+        form = self.make_form(make_image(SMALL_SIZE))
+        with override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000), \
+                mock.patch.object(ImageFile.ImageFile, 'load') as load:
+            self.assertFalse(form.is_valid())
+        load.assert_not_called()
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'too_large')
+
+    def test_formats_without_draft_have_lower_limit(self):
+        """PNG, который пришлось бы декодировать целиком, ограничен
+        сильнее JPEG того же размера."""
+        with override_settings(IMAGE_UPLOAD_MAX_DECODED_PIXELS=1000):
+            form = self.make_form(make_image(SMALL_SIZE, 'PNG', 'photo.png'))
+            self.assertFalse(form.is_valid())
+            self.assertEqual(
+                form.errors.as_data()['image'][0].code, 'too_large'
+            )
+            self.assertTrue(self.make_form(make_image(SMALL_SIZE)).is_valid())
+
+    def test_unsupported_format_is_rejected(self):
+        """Форматы не из IMAGE_UPLOAD_FORMATS не принимаются."""
+        form = self.make_form(make_image(SMALL_SIZE, 'BMP', 'photo.bmp'))
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors.as_data()['image'][0].code, 'format')
+
+    def test_handler_hashes_while_streaming(self):
+        """Обработчик загрузки пишет файл на диск и считает его хеш."""
+        content = make_image(SMALL_SIZE).read()
+        handler = HashingUploadHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', len(content))
+        for start in range(0, len(content), 100):
+            handler.receive_data_chunk(content[start:start + 100], start)
+        upload = handler.file_complete(len(content))
+        self.assertEqual(
+            upload.content_hash, hashlib.sha256(content).hexdigest()
+        )
+        with open(upload.temporary_file_path(), 'rb') as file_:
+            self.assertEqual(file_.read(), content)
+        upload.close()
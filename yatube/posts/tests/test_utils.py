@@ -0,0 +1,149 @@
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from posts.models import Post, User
+from posts.utils import (POSTS_PER_PAGE, CachedCountPaginator,
+                         CursorPaginator, get_pages, page_window)
+
+
+TEST_AUTHOR = 'test_utils_author'
+TEST_POST_TEXT = 'Test post text'
+POSTS_COUNT = POSTS_PER_PAGE * 2 + 5
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        Post.objects.bulk_create([
+            Post(text=f'{TEST_POST_TEXT} {i}', author=cls.author)
+            for i in range(POSTS_COUNT)
+        ])
+        Post.objects.update(pub_date=timezone.now())
+        cls.factory = RequestFactory()
+
+    def walk(self, direction, page):
+        pages = [page]
+        while getattr(page, f'has_{direction}')():
+            cursor = getattr(page, f'{direction}_cursor')
+            key = 'after' if direction == 'next' else 'before'
+            request = self.factory.get('/', {key: cursor})
+            page = get_pages(request, Post.objects.all(), cursor=True)
+            pages.append(page)
+        return pages
+
+    def test_pages_cover_feed_without_gaps(self):
+        """Курсорные страницы обходят всю ленту без пропусков и дублей,
+        даже если у записей одинаковое время публикации."""
+        first = get_pages(self.factory.get('/'), Post.objects.all(), True)
+        self.assertFalse(first.has_previous())
+        pages = self.walk('next', first)
+        ids = [post.pk for page in pages for post in page]
+        self.assertEqual(
+            ids,
+            list(Post.objects.order_by('-pub_date', '-pk')
+                 .values_list('pk', flat=True))
+        )
+        self.assertEqual(len(pages[0]), POSTS_PER_PAGE)
+        self.assertEqual(len(pages[-1]), POSTS_COUNT % POSTS_PER_PAGE)
+
+    def test_previous_pages_mirror_next_pages(self):
+        """Переход назад по курсору возвращает те же страницы."""
+        first = get_pages(self.factory.get('/'), Post.objects.all(), True)
+        forward = self.walk('next', first)
+        backward = self.walk('previous', forward[-1])
+        self.assertEqual(
+            [[post.pk for post in page] for page in forward],
+            [[post.pk for post in page] for page in reversed(backward)]
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Некорректный курсор не ломает страницу."""
+        paginator = CursorPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        for token in ('garbage', 'Zm9vfGJhcg', '!!!'):
+            with self.subTest(token=token):
+                page = paginator.get_page(after=token)
+                self.assertFalse(page.has_previous())
+                self.assertEqual(len(page), POSTS_PER_PAGE)
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        Post.objects.bulk_create([
+            Post(text=f'{TEST_POST_TEXT} {i}', author=cls.author)
+            for i in range(POSTS_COUNT)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached_between_requests(self):
+        """Повторный подсчет записей не ходит в базу."""
+        first = CachedCountPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        self.assertEqual(first.count, POSTS_COUNT)
+        with self.assertNumQueries(0):
+            second = CachedCountPaginator(Post.objects.all(), POSTS_PER_PAGE)
+            self.assertEqual(second.count, POSTS_COUNT)
+
+    def test_count_is_reset_on_post_save_and_delete(self):
+        """Создание и удаление записи сбрасывает закешированный подсчет."""
+        CachedCountPaginator(Post.objects.all(), POSTS_PER_PAGE).count
+        post = Post.objects.create(text=TEST_POST_TEXT, author=self.author)
+        paginator = CachedCountPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        self.assertEqual(paginator.count, POSTS_COUNT + 1)
+        post.delete()
+        paginator = CachedCountPaginator(Post.objects.all(), POSTS_PER_PAGE)
+        self.assertEqual(paginator.count, POSTS_COUNT)
+
+    def test_large_count_is_estimated(self):
+        """Выше порога подсчет помечается как оценка и не сбрасывается
+        при каждой новой записи."""
+        class SmallThresholdPaginator(CachedCountPaginator):
+            estimate_threshold = POSTS_PER_PAGE
+
+        paginator = SmallThresholdPaginator(Post.objects.all(), 1)
+        estimate = paginator.count
+        self.assertGreaterEqual(estimate, POSTS_COUNT)
+        self.assertTrue(paginator.count_is_estimated)
+        Post.objects.create(text=TEST_POST_TEXT, author=self.author)
+        with self.assertNumQueries(0):
+            paginator = SmallThresholdPaginator(Post.objects.all(), 1)
+            self.assertEqual(paginator.count, estimate)
+
+    def test_estimate_skips_count(self):
+        """Оценка вызывающего кода заменяет COUNT(*) по таблице."""
+        class SmallThresholdPaginator(CachedCountPaginator):
+            estimate_threshold = POSTS_PER_PAGE
+
+        posts = Post.objects.filter(author=self.author)
+        with self.assertNumQueries(1):
+            paginator = SmallThresholdPaginator(
+                posts, 1, estimate=lambda: POSTS_COUNT * 2
+            )
+            self.assertEqual(paginator.count, POSTS_COUNT * 2)
+        self.assertTrue(paginator.count_is_estimated)
+
+    def test_page_window_is_bounded(self):
+        """Окно страниц не зависит от их общего количества."""
+        paginator = Paginator(range(1000), 1)
+        cases = (
+            (1, [1, 2, 3, None, 1000]),
+            (500, [1, None, 498, 499, 500, 501, 502, None, 1000]),
+            (999, [1, None, 997, 998, 999, 1000]),
+        )
+        for number, expected in cases:
+            with self.subTest(number=number):
+                self.assertEqual(
+                    page_window(paginator.page(number)),
+                    expected
+                )
+        self.assertEqual(
+            page_window(Paginator(range(3), 1).page(2)),
+            [1, 2, 3]
+        )
@@ -1,20 +1,34 @@
+import hashlib
+import os
 import shutil
 import tempfile
 
 from http import HTTPStatus
 
 from django.core.paginator import Page
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from posts.feeds import QUERY_BUDGETS
 from posts.forms import PostForm
-from posts.models import Group, Post, User, Follow
+from posts.models import Comment, Group, Post, User, Follow
+from posts.utils import COMMENTS_PER_PAGE
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+# Хранилище ключей sorl тестов не трогает настоящее.
+THUMBNAIL_CACHES = {
+    **settings.CACHES,
+    'thumbnails': {
+        'BACKEND': 'core.kvstore.ThumbnailCache',
+        'LOCATION': os.path.join(TEMP_MEDIA_ROOT, 'kvstore'),
+    },
+}
 
 GROUP_SLUG = 'test_group'
 TEST_USER = 'test_views1'
@@ -25,8 +39,6 @@ TEST_GROUP_DESCRIPTION = 'Test group description'
 UNFOLLOWING_USER = 'unfollowing'
 POSTS_ON_FIRST_PAGE = 10
 POSTS_ON_SECOND_PAGE = 3
-TEST_POST_IMAGE = 'posts/small.gif'
-
 SMALL_GIF = (
     b'\x47\x49\x46\x38\x39\x61\x02\x00'
     b'\x01\x00\x80\x00\x00\x00\x00\x00'
@@ -35,6 +47,10 @@ SMALL_GIF = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(SMALL_GIF).hexdigest()
+TEST_POST_IMAGE = (
+    f'posts/{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH[2:4]}/{SMALL_GIF_HASH}.gif'
+)
 
 INDEX_URL = reverse('posts:index')
 GROUP_URL = reverse('posts:group_list', args=[GROUP_SLUG])
@@ -52,9 +68,14 @@ POST_DETAIL_TEMPLATE = 'posts/post_detail.html'
 POST_CREATE_TEMPLATE = 'posts/create_post.html'
 POST_EDIT_TEMPLATE = 'posts/create_post.html'
 FOLLOW_INDEX_TEMPLATE = 'posts/follow.html'
+COMMENTS_TEMPLATE = 'includes/comments_list.html'
+TEST_COMMENT_TEXT = 'Test comment text'
+CHANGED_TEXT = 'Changed test post text'
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, CACHES=THUMBNAIL_CACHES
+)
 class PostsViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -223,18 +244,50 @@ class PostsViewsTests(TestCase):
             self.assertEqual(len(response.context['page_obj']), posts_per_page)
 
     def test_cache_index_page(self):
-        """Главная страница кешируется."""
+        """Главная страница кешируется до изменения записей."""
         response1 = self.client.get(INDEX_URL + '?page=2')
+        Post.objects.filter(pk=self.post.pk).update(text=CHANGED_TEXT)
+        response2 = self.client.get(INDEX_URL + '?page=2')
+        self.assertEqual(response1.content, response2.content)
         Post.objects.create(
             text=self.post.text,
             author=self.post.author,
         )
-        response2 = self.client.get(INDEX_URL + '?page=2')
-        self.assertEqual(response1.content, response2.content)
-        cache.clear()
         response3 = self.client.get(INDEX_URL + '?page=2')
         self.assertNotEqual(response1.content, response3.content)
 
+    def test_pages_are_invalidated_by_tags(self):
+        """Закешированные страницы группы, профиля и записи сразу
+        обновляются после изменений, которые их касаются."""
+        changes = (
+            (GROUP_URL, lambda: Post.objects.create(
+                text=CHANGED_TEXT,
+                author=self.user,
+                group=self.post.group,
+            )),
+            (PROFILE_URL, lambda: Follow.objects.create(
+                user=self.user,
+                author=self.post.author,
+            )),
+            (self.POST_DETAIL_URL, lambda: Comment.objects.create(
+                post=self.post,
+                author=self.user,
+                text=TEST_COMMENT_TEXT,
+            )),
+        )
+        for url, change in changes:
+            with self.subTest(url=url):
+                response1 = self.client.get(url)
+                Post.objects.filter(pk=self.post.pk).update(text=CHANGED_TEXT)
+                response2 = self.client.get(url)
+                self.assertEqual(response1.content, response2.content)
+                change()
+                response3 = self.client.get(url)
+                self.assertNotEqual(response1.content, response3.content)
+                Post.objects.filter(pk=self.post.pk).update(
+                    text=TEST_POST_TEXT
+                )
+
     def test_authorized_user_can_follow(self):
         """Авторизованный пользователь может подписываться на
         других пользователей."""
@@ -287,3 +340,119 @@ class PostsViewsTests(TestCase):
         followers_count = follower.follower.all().count()
         self.authorized_client.get(SUBSCRIBE_URSELF)
         self.assertEqual(followers_count, 0)
+
+
+class FeedQueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USER)
+        cls.author = User.objects.create_user(
+            username=TEST_AUTHOR,
+            first_name='Test',
+            last_name='Author'
+        )
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=GROUP_SLUG
+        )
+        authors = [
+            User.objects.create_user(username=f'{TEST_AUTHOR}_{i}')
+            for i in range(POSTS_ON_FIRST_PAGE)
+        ] + [cls.author]
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for i in range(POSTS_ON_FIRST_PAGE + POSTS_ON_SECOND_PAGE):
+            Post.objects.create(
+                text=TEST_POST_TEXT,
+                author=authors[i % len(authors)],
+                group=cls.group,
+            )
+            Post.objects.create(text=TEST_POST_TEXT, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_feeds_fit_query_budgets(self):
+        """Ленты укладываются в бюджет запросов и не делают N+1."""
+        urls = {
+            'index': INDEX_URL,
+            'group_posts': GROUP_URL,
+            'profile': PROFILE_URL,
+            'follow_index': FOLLOW_INDEX_URL,
+        }
+        for feed, url in urls.items():
+            with self.subTest(feed=feed):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    POSTS_ON_FIRST_PAGE
+                )
+                self.assertLessEqual(
+                    len(queries),
+                    QUERY_BUDGETS[feed],
+                    '\n'.join(query['sql'] for query in queries)
+                )
+
+
+class PostDetailCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username=TEST_AUTHOR)
+        cls.post = Post.objects.create(author=cls.author, text=TEST_POST_TEXT)
+        commenters = [
+            User.objects.create_user(username=f'{TEST_USER}_{i}')
+            for i in range(COMMENTS_PER_PAGE + POSTS_ON_SECOND_PAGE)
+        ]
+        for commenter in commenters:
+            Comment.objects.create(
+                post=cls.post,
+                author=commenter,
+                text=TEST_COMMENT_TEXT
+            )
+        cls.POST_DETAIL_URL = reverse('posts:post_detail', args=[cls.post.pk])
+        cls.POST_COMMENTS_URL = reverse(
+            'posts:post_comments',
+            args=[cls.post.pk]
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_shows_first_page_of_comments(self):
+        """post_detail показывает первую страницу комментариев
+        с авторами за один запрос."""
+        with self.assertNumQueries(3):
+            response = self.client.get(self.POST_DETAIL_URL)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            list(self.post.comments.order_by('-created', '-pk')
+                 .values_list('pk', flat=True)[:COMMENTS_PER_PAGE])
+        )
+
+    def test_older_comments_are_loaded_by_fragment(self):
+        """Старые комментарии отдаются фрагментом по курсору."""
+        first_page = self.client.get(self.POST_DETAIL_URL).context['comments']
+        response = self.client.get(
+            self.POST_COMMENTS_URL,
+            {'after': first_page.next_cursor}
+        )
+        self.assertTemplateUsed(response, COMMENTS_TEMPLATE)
+        self.assertEqual(len(response.context['comments']),
+                         POSTS_ON_SECOND_PAGE)
+        self.assertFalse(response.context['comments'].has_next())
+
+    def test_comments_of_missing_post_are_not_found(self):
+        """Фрагмент комментариев несуществующей записи отвечает 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 1])
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,178 @@
+import base64
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image, ImageFilter, features
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from core import jobs
+from core.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+# Картинка записи показывается кадром 960x339 в нескольких ширинах;
+# WebP - только если Pillow собран с libwebp.
+CARD_WIDTHS = (480, 960, 1440)
+CARD_SIZE = (960, 339)
+FORMATS = (('JPEG', 'image/jpeg'),)
+if features.check('webp'):
+    FORMATS = (('WEBP', 'image/webp'),) + FORMATS
+PRESETS = tuple(
+    (
+        f'{width}x{round(width * CARD_SIZE[1] / CARD_SIZE[0])}',
+        {'crop': 'center', 'upscale': True, 'format': image_format},
+    )
+    for image_format, _ in FORMATS
+    for width in CARD_WIDTHS
+)
+PLACEHOLDER_WIDTH = 24
+PLACEHOLDER_QUALITY = 40
+PENDING_KEY_PREFIX = 'thumbnail:pending:'
+PENDING_TIMEOUT = 60 * 5
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который никогда не вызывает Pillow при рендере.
+
+    Готовая миниатюра берется из хранилища ключей, а вместо отсутствующей
+    отдается исходная картинка; саму миниатюру, если очередь задач
+    не выполняется сразу, готовит воркер.
+    """
+
+    def thumbnail_options(self, source, options):
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.thumbnail_options(source, options)
+        )
+        return ImageFile(name, default.storage)
+
+    def get_ready(self, file_, geometry_string, **options):
+        """Готовая миниатюра или None; недостающая ставится в очередь."""
+        thumbnail = default.kvstore.get(
+            self.thumbnail_file(file_, geometry_string, **options)
+        )
+        if not thumbnail and not settings.JOB_QUEUE_EAGER:
+            schedule(ImageFile(file_).name)
+        return thumbnail
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        return (
+            self.get_ready(file_, geometry_string, **options)
+            or ImageFile(file_)
+        )
+
+
+def responsive(image):
+    """Адрес, srcset и источники <picture> для картинки записи.
+
+    Берет только готовые варианты; пока их нет, отдается исходник.
+    """
+    if not image:
+        return None
+    variants = {image_format: {} for image_format, _ in FORMATS}
+    for geometry, options in PRESETS:
+        thumbnail = default.backend.get_ready(image, geometry, **options)
+        if thumbnail:
+            variants[options['format']][thumbnail.width] = thumbnail.url
+
+    def srcset(urls):
+        return ', '.join(f'{url} {width}w' for width, url in urls.items())
+
+    jpeg = variants.pop('JPEG')
+    return {
+        'src': jpeg.get(CARD_SIZE[0], image.url),
+        'srcset': srcset(jpeg),
+        'sources': [
+            {'type': mime_type, 'srcset': srcset(variants[image_format])}
+            for image_format, mime_type in FORMATS
+            if variants.get(image_format)
+        ],
+        'width': CARD_SIZE[0],
+        'height': CARD_SIZE[1],
+    }
+
+
+def prefetched(posts):
+    """Достает из хранилища ключей все варианты картинок этих записей
+    одним обращением, чтобы рендер страницы не ходил туда по разу на
+    каждую миниатюру."""
+    return default.kvstore.prefetched([
+        default.backend.thumbnail_file(post.image, geometry, **options)
+        for post in posts if post.image
+        for geometry, options in PRESETS
+    ])
+
+
+def make_placeholder(file_):
+    """Размытая JPEG-превьюшка кадра в пару сотен байт как data URI."""
+    with Image.open(file_) as image:
+        image.draft('RGB', (PLACEHOLDER_WIDTH * 4, PLACEHOLDER_WIDTH * 4))
+        image = image.convert('RGB')
+    width, height = image.size
+    ratio = CARD_SIZE[1] / CARD_SIZE[0]
+    if height > width * ratio:
+        top = (height - round(width * ratio)) // 2
+        image = image.crop((0, top, width, top + round(width * ratio)))
+    else:
+        left = (width - round(height / ratio)) // 2
+        image = image.crop((left, 0, left + round(height / ratio), height))
+    image = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(PLACEHOLDER_WIDTH * ratio))),
+        Image.BILINEAR,
+    ).filter(ImageFilter.GaussianBlur(1))
+    data = BytesIO()
+    image.save(data, 'JPEG', quality=PLACEHOLDER_QUALITY, optimize=True)
+    return 'data:image/jpeg;base64,' + base64.b64encode(
+        data.getvalue()
+    ).decode()
+
+
+def generate(name):
+    """Готовит все PRESETS и размытое превью для картинки и сбрасывает
+    страницы ее записей."""
+    from .models import Post
+    from .signals import post_page_tags
+
+    backend = ThumbnailBackend()
+    storage = Post._meta.get_field('image').storage
+    try:
+        for geometry, options in PRESETS:
+            backend.get_thumbnail(
+                ImageFile(name, storage), geometry, **options
+            )
+        with storage.open(name) as file_:
+            Post.objects.filter(image=name).update(
+                image_placeholder=make_placeholder(file_)
+            )
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', name)
+    finally:
+        cache.delete(PENDING_KEY_PREFIX + name)
+    for post in Post.objects.filter(image=name):
+        invalidate_tags(*post_page_tags(post))
+
+
+def schedule(name):
+    """Ставит подготовку миниатюр картинки в очередь задач, если ее
+    там еще нет."""
+    if cache.add(PENDING_KEY_PREFIX + name, 1, PENDING_TIMEOUT):
+        jobs.enqueue(generate, name)
@@ -0,0 +1,225 @@
+import heapq
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Q, Sum
+
+from . import feeds
+from .models import Follow, Post, Timeline, UserStats
+
+# Первая порция записей популярного автора для среза без конца.
+PULL_CHUNK = 100
+
+
+def is_celebrity(author_id):
+    """Записи автора с большим числом подписчиков не раскладываются
+    по лентам, а подмешиваются при чтении."""
+    return UserStats.objects.filter(
+        pk=author_id,
+        followers_count__gte=settings.TIMELINE_CELEBRITY_THRESHOLD,
+    ).exists()
+
+
+def celebrities_followed_by(user):
+    return list(
+        Follow.objects
+        .filter(
+            user=user,
+            author__stats__followers_count__gte=(
+                settings.TIMELINE_CELEBRITY_THRESHOLD
+            ),
+        )
+        .values_list('author_id', flat=True)
+    )
+
+
+class HybridFeed:
+    """Лента подписок, в которой разложенные записи сливаются
+    с записями популярных авторов, прочитанными по индексу автора.
+
+    Поддерживает count() и срезы, поэтому ее можно отдавать Paginator.
+    """
+
+    ordered = True
+
+    def __init__(self, user, pushed, pulled_author_ids):
+        self.user = user
+        self.pushed = pushed
+        self.pulled_author_ids = pulled_author_ids
+        self.count_cache_key = f'posts:count:timeline:{user.pk}'
+
+    def _pulled(self, author_id, chunk):
+        """Записи популярного автора по порядку ленты.
+
+        Читаются по индексу (author, pub_date) порциями, каждая вдвое
+        больше предыдущей и начинается после последней прочитанной
+        записи, так что лишнего читается не больше, чем забрало слияние.
+        """
+        posts = feeds.post_cards().filter(author_id=author_id).order_by(
+            '-pub_date', '-pk'
+        )
+        rows = list(posts[:chunk])
+        while rows:
+            yield from rows
+            if len(rows) < chunk:
+                return
+            last = rows[-1]
+            chunk *= 2
+            rows = list(posts.filter(
+                Q(pub_date__lt=last.pub_date)
+                | Q(pub_date=last.pub_date, pk__lt=last.pk)
+            )[:chunk])
+
+    def count(self):
+        """Разложенные записи считаются по ленте, записи популярных
+        авторов - по их счетчикам."""
+        pulled = UserStats.objects.filter(
+            pk__in=self.pulled_author_ids
+        ).aggregate(posts=Sum('posts_count'))['posts']
+        return self.pushed.count() + (pulled or 0)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        """Срезы и индексы, как у QuerySet: срез без конца читает
+        ленту до конца, отрицательные индексы не поддерживаются."""
+        if not isinstance(index, (int, slice)):
+            raise TypeError(
+                f'Индекс ленты должен быть int или slice, '
+                f'а не {type(index).__name__}.'
+            )
+        if not isinstance(index, slice):
+            if index < 0:
+                raise ValueError('Отрицательные индексы не поддерживаются.')
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        if start < 0 or (stop is not None and stop < 0):
+            raise ValueError('Отрицательные индексы не поддерживаются.')
+        chunk = PULL_CHUNK if stop is None else max(1, stop - start)
+        merged = heapq.merge(
+            self.pushed[:stop] if stop is not None else self.pushed,
+            *(
+                self._pulled(author_id, chunk)
+                for author_id in self.pulled_author_ids
+            ),
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=True,
+        )
+        return list(islice(merged, start, stop, index.step))
+
+
+def feed(user):
+    """Лента подписок пользователя.
+
+    Записи обычных авторов читаются одним диапазоном по индексу
+    (user, pub_date), записи популярных авторов подмешиваются
+    k-way слиянием при чтении.
+    """
+    pushed = (
+        feeds.post_cards()
+        .filter(timeline_entries__user=user)
+        .order_by('-timeline_entries__pub_date', '-timeline_entries__pk')
+    )
+    celebrities = celebrities_followed_by(user)
+    if not celebrities:
+        return pushed
+    return HybridFeed(
+        user,
+        pushed.exclude(author_id__in=celebrities),
+        celebrities,
+    )
+
+
+def estimate(user):
+    """Оценка длины ленты подписок по счетчикам авторов, без чтения
+    записей: разложенная часть не длиннее TIMELINE_MAX_LENGTH."""
+    authors = Follow.objects.filter(user=user).values_list(
+        'author__stats__posts_count', 'author__stats__followers_count'
+    )
+    pushed = pulled = 0
+    for posts_count, followers_count in authors:
+        if (followers_count or 0) >= settings.TIMELINE_CELEBRITY_THRESHOLD:
+            pulled += posts_count
+        else:
+            pushed += posts_count or 0
+    return min(pushed, settings.TIMELINE_MAX_LENGTH) + pulled
+
+
+def trim(user_ids):
+    """Оставляет в ленте каждого пользователя не больше
+    TIMELINE_MAX_LENGTH последних записей."""
+    for user_id in user_ids:
+        overflow = (
+            Timeline.objects
+            .filter(user_id=user_id)
+            .order_by('-pub_date', '-pk')
+            .values('pk')[settings.TIMELINE_MAX_LENGTH:]
+        )
+        Timeline.objects.filter(pk__in=overflow).delete()
+
+
+def fan_out(post_id):
+    """Раскладывает новую запись по лентам подписчиков автора."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or is_celebrity(post.author_id):
+        return
+    followers = list(
+        Follow.objects
+        .filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    Timeline.objects.bulk_create(
+        [
+            Timeline(
+                user_id=user_id,
+                post=post,
+                author_id=post.author_id,
+                pub_date=post.pub_date,
+            )
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    trim(followers)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту подписчика последние записи нового автора."""
+    if is_celebrity(author_id):
+        return
+    posts = (
+        Post.objects
+        .filter(author_id=author_id)
+        .order_by('-pub_date')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+    )
+    Timeline.objects.bulk_create(
+        [
+            Timeline(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for post_id, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def demote(author_id):
+    """Раскладывает записи автора, переставшего быть популярным, по
+    лентам подписчиков: пока он был популярным, они не раскладывались
+    и читались при чтении ленты."""
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    for user_id in followers.iterator():
+        backfill(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты записи автора, от которого отписались."""
+    Timeline.objects.filter(user_id=user_id, author_id=author_id).delete()
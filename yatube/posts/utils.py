@@ -1,8 +1,259 @@
+import base64
+import binascii
+import hashlib
+from collections.abc import Sequence
+
+from django.core.cache import cache
 from django.core.paginator import Paginator
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+POSTS_PER_PAGE = 10
+COMMENTS_PER_PAGE = 20
+PAGE_WINDOW_ON_EACH_SIDE = 2
+PAGE_WINDOW_ON_ENDS = 1
+COUNT_CACHE_TIMEOUT = 60
+COUNT_ESTIMATE_THRESHOLD = 10000
+COUNT_ESTIMATE_TIMEOUT = 60 * 60
+COUNT_VERSION_KEY = 'posts:count_version'
+
+
+def bump_count_version():
+    """Сбрасывает все закешированные точные количества записей."""
+    try:
+        cache.incr(COUNT_VERSION_KEY)
+    except ValueError:
+        cache.set(COUNT_VERSION_KEY, 1, None)
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator, который не считает COUNT(*) на каждый запрос.
+
+    Точное количество кешируется по сигнатуре запроса на
+    COUNT_CACHE_TIMEOUT секунд и сбрасывается при сохранении или
+    удалении записи. Если записей больше estimate_threshold, берется
+    дешевая оценка: estimate() вызывающего кода, например счетчик
+    группы, или MAX(id) таблицы. Оценка живет в кеше
+    COUNT_ESTIMATE_TIMEOUT секунд и не сбрасывается при записи.
+    """
+
+    estimate_threshold = COUNT_ESTIMATE_THRESHOLD
+    count_is_estimated = False
+
+    def __init__(self, object_list, per_page, estimate=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.estimate = estimate
+
+    def _count_cache_key(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None:
+            return getattr(self.object_list, 'count_cache_key', None)
+        sql, params = query.sql_with_params()
+        signature = repr((self.object_list.db, sql, params)).encode()
+        return 'posts:count:' + hashlib.md5(signature).hexdigest()
+
+    def estimated_count(self):
+        """Оценка без просмотра строк или None, если ее взять неоткуда.
+
+        Для всей таблицы это MAX(id) по индексу первичного ключа.
+        """
+        if self.estimate is not None:
+            return self.estimate()
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return None
+        return self.object_list.model._default_manager.aggregate(
+            last=Max('pk')
+        )['last']
+
+    def bounded_count(self):
+        """Точный подсчет, который читает не больше порога + 1 строк."""
+        if not hasattr(self.object_list, 'order_by'):
+            return len(self.object_list)
+        return self.object_list.order_by()[
+            :self.estimate_threshold + 1
+        ].count()
+
+    @cached_property
+    def count(self):
+        key = self._count_cache_key()
+        if key is None:
+            return super().count
+        version = cache.get(COUNT_VERSION_KEY, 0)
+        exact_key = f'{key}:{version}'
+        estimate_key = f'{key}:estimate'
+        cached = cache.get_many([exact_key, estimate_key])
+        if exact_key in cached:
+            return cached[exact_key]
+        if estimate_key in cached:
+            self.count_is_estimated = True
+            return cached[estimate_key]
+        count = self.bounded_count()
+        if count <= self.estimate_threshold:
+            cache.set(exact_key, count, COUNT_CACHE_TIMEOUT)
+            return count
+        estimate = self.estimated_count()
+        if estimate is None:
+            # Взять оценку неоткуда: точный подсчет раз в
+            # COUNT_ESTIMATE_TIMEOUT.
+            estimate = super().count
+        estimate = max(estimate, count)
+        cache.set(estimate_key, estimate, COUNT_ESTIMATE_TIMEOUT)
+        self.count_is_estimated = True
+        return estimate
+
+
+def page_window(page, on_each_side=PAGE_WINDOW_ON_EACH_SIDE,
+                on_ends=PAGE_WINDOW_ON_ENDS):
+    """Номера страниц вокруг текущей; None означает пропуск."""
+    number = page.number
+    num_pages = page.paginator.num_pages
+    if num_pages <= (on_each_side + on_ends) * 2 + 1:
+        return list(range(1, num_pages + 1))
+    window = []
+    if number > on_each_side + on_ends + 1:
+        window.extend(range(1, on_ends + 1))
+        window.append(None)
+        window.extend(range(number - on_each_side, number + 1))
+    else:
+        window.extend(range(1, number + 1))
+    if number < num_pages - on_each_side - on_ends:
+        window.extend(range(number + 1, number + on_each_side + 1))
+        window.append(None)
+        window.extend(range(num_pages - on_ends + 1, num_pages + 1))
+    else:
+        window.extend(range(number + 1, num_pages + 1))
+    return window
+
+
+class CursorPage(Sequence):
+    """Страница ленты, полученная по курсору, а не по номеру."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<CursorPage of %s items>' % len(self)
 
+    def __len__(self):
+        return len(self.object_list)
 
-def get_pages(request, post_list):
-    posts_per_page = 10
-    paginator = Paginator(post_list, posts_per_page)
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def next_cursor(self):
+        if self.has_next():
+            return self.paginator.encode_cursor(self.object_list[-1])
+        return None
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous():
+            return self.paginator.encode_cursor(self.object_list[0])
+        return None
+
+
+class CursorPaginator:
+    """Keyset-пагинация по паре (field, id) в порядке убывания.
+
+    Стоимость любой страницы одинакова: вместо OFFSET и COUNT(*)
+    выполняется один запрос вида WHERE (field, id) < (x, y) LIMIT n + 1.
+    """
+
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.field = field
+
+    def encode_cursor(self, obj):
+        raw = '%s|%s' % (getattr(obj, self.field).isoformat(), obj.pk)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, token):
+        """Возвращает (значение поля, pk) или None для битого токена."""
+        if not token:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+            value, pk = raw.decode().rsplit('|', 1)
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+        if value is None:
+            return None
+        return value, pk
+
+    def _older_than(self, value, pk):
+        return (
+            Q(**{f'{self.field}__lt': value})
+            | Q(**{self.field: value, 'pk__lt': pk})
+        )
+
+    def _newer_than(self, value, pk):
+        return (
+            Q(**{f'{self.field}__gt': value})
+            | Q(**{self.field: value, 'pk__gt': pk})
+        )
+
+    def get_page(self, after=None, before=None):
+        after = self.decode_cursor(after)
+        before = self.decode_cursor(before)
+        limit = self.per_page + 1
+        if before is not None and after is None:
+            rows = list(
+                self.object_list
+                .filter(self._newer_than(*before))
+                .order_by(self.field, 'pk')[:limit]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(rows, self, True, has_previous)
+        queryset = self.object_list
+        if after is not None:
+            queryset = queryset.filter(self._older_than(*after))
+        rows = list(queryset.order_by(f'-{self.field}', '-pk')[:limit])
+        return CursorPage(
+            rows[:self.per_page],
+            self,
+            len(rows) > self.per_page,
+            after is not None,
+        )
+
+
+def get_pages(request, post_list, cursor=False, estimate=None):
+    """Страница ленты; estimate - дешевая оценка числа записей для
+    больших лент, см. CachedCountPaginator."""
+    if cursor:
+        return CursorPaginator(post_list, POSTS_PER_PAGE).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    paginator = CachedCountPaginator(
+        post_list, POSTS_PER_PAGE, estimate=estimate
+    )
     page_number = request.GET.get('page')
     return paginator.get_page(page_number)
+
+
+def get_comments(request, comment_list):
+    """Страница комментариев от новых к старым по курсору (created, id)."""
+    return CursorPaginator(
+        comment_list, COMMENTS_PER_PAGE, field='created'
+    ).get_page(after=request.GET.get('after'))
@@ -1,68 +1,112 @@
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
-from django.views.decorators.cache import cache_page
 
+from core.cache import cache_page_tagged, tag
+from . import feeds, thumbnails
 from .forms import PostForm, CommentForm
 from .models import Group, Post, User, Follow
-from .utils import get_pages
+from .signals import INDEX_FEED_TAG
+from .utils import get_comments, get_pages
 
+PAGE_CACHE_TIMEOUT = 60 * 60 * 4
 
-@cache_page(20, key_prefix='index_page')
+
+def author_tags(request, username):
+    return [
+        tag('author', pk) for pk in feeds.authors().filter(
+            username=username).values_list('pk', flat=True).cached()
+    ]
+
+
+def post_tags(request, post_id):
+    return [tag('post', post_id)] + [
+        tag('author', pk) for pk in Post.objects.filter(
+            pk=post_id).values_list('author_id', flat=True).cached()
+    ]
+
+
+def render_posts(request, template_name, context, posts):
+    """render, который заранее одним обращением достает миниатюры
+    записей страницы."""
+    with thumbnails.prefetched(posts):
+        return render(request, template_name, context)
+
+
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, [INDEX_FEED_TAG], 'index_page')
 def index(request):
-    return render(
+    page_obj = get_pages(request, feeds.index())
+    return render_posts(
         request,
         'posts/index.html',
-        {
-            'page_obj': get_pages(
-                request,
-                Post.objects.select_related('author', 'group').all())
-        }
+        {'page_obj': page_obj},
+        page_obj
     )
 
 
+@cache_page_tagged(
+    PAGE_CACHE_TIMEOUT,
+    lambda request, slug: [tag('group', slug)],
+    'group_page'
+)
 def group_posts(request, slug):
-    return render(
+    group = get_object_or_404(Group.objects.cached(), slug=slug)
+    page_obj = get_pages(
+        request, feeds.group(group), estimate=feeds.group_estimate(group)
+    )
+    return render_posts(
         request,
         'posts/group_list.html',
         {
-            'page_obj': get_pages(
-                request,
-                get_object_or_404(Group, slug=slug).posts.all()),
-            'group': get_object_or_404(Group, slug=slug),
-        }
+            'page_obj': page_obj,
+            'group': group,
+        },
+        page_obj
     )
 
 
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, author_tags, 'profile_page')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    if (request.user.is_authenticated) and (request.user != author) and not (
-            Follow.objects.filter(user=request.user, author=author).exists()):
-        return render(
-            request,
-            'posts/profile.html',
-            {
-                'author': author,
-                'page_obj': get_pages(request, author.posts.all()),
-            }
-        )
-    return render(
+    author = get_object_or_404(feeds.authors().cached(), username=username)
+    page_obj = get_pages(
+        request, feeds.profile(author),
+        estimate=feeds.profile_estimate(author),
+    )
+    return render_posts(
         request,
         'posts/profile.html',
         {
             'author': author,
-            'page_obj': get_pages(request, author.posts.all()),
-            'following': True,
-        }
+            'page_obj': page_obj,
+        },
+        page_obj
     )
 
 
+@cache_page_tagged(PAGE_CACHE_TIMEOUT, post_tags, 'post_page')
 def post_detail(request, post_id):
-    return render(
+    post = get_object_or_404(feeds.post_detail().cached(), pk=post_id)
+    return render_posts(
         request,
         'posts/post_detail.html',
         {
-            'post': get_object_or_404(Post, pk=post_id),
-            'form': CommentForm(request.POST or None),
+            'post': post,
+            'comments': get_comments(request, feeds.comments(post.pk)),
+        },
+        [post]
+    )
+
+
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).values_list(
+            'pk', flat=True).cached():
+        raise Http404('Запись не найдена.')
+    return render(
+        request,
+        'includes/comments_list.html',
+        {
+            'post_id': post_id,
+            'comments': get_comments(request, feeds.comments(post_id)),
         }
     )
 
@@ -115,14 +159,15 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    return render(
+    page_obj = get_pages(
+        request, feeds.follow(request.user),
+        estimate=feeds.follow_estimate(request.user),
+    )
+    return render_posts(
         request,
         'posts/follow.html',
-        {
-            'page_obj': get_pages(
-                request,
-                Post.objects.filter(author__following__user=request.user))
-        }
+        {'page_obj': page_obj},
+        page_obj
     )
 
 
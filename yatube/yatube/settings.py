@@ -44,11 +44,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.UserFragmentsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -56,6 +58,17 @@ MIDDLEWARE = [
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки пишутся на диск с первого байта, а хеш для хранилища
+# считается по ходу записи.
+FILE_UPLOAD_HANDLERS = ['core.uploads.HashingUploadHandler']
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# Кадры больше отклоняются по заголовку, еще до декодирования.
+IMAGE_UPLOAD_MAX_PIXELS = 50 * 10 ** 6
+# Предел для форматов без draft (PNG, GIF, WebP): их кадр при уменьшении
+# декодируется целиком, до 4 байт на пиксель.
+IMAGE_UPLOAD_MAX_DECODED_PIXELS = 16 * 10 ** 6
+# Большая сторона сохраняемого оригинала; с запасом на кадр 1440 px.
+IMAGE_UPLOAD_MAX_SIDE = 2560
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 LOGIN_URL = 'users:login'
@@ -91,12 +104,47 @@ DATABASES = {
     }
 }
 
+# Приложения с отдельной базой; пока алиас не настроен в DATABASES,
+# их таблицы живут в default.
+DATABASE_APPS_MAPPING = {
+    'sessions': 'sessions',
+    'thumbnail': 'thumbnails',
+}
+# Чтение идет в реплику, только если алиас replica настроен.
+DATABASE_ROUTERS = [
+    'core.routers.AppDatabaseRouter',
+    'core.routers.ReplicaRouter',
+]
+
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+THUMBNAIL_KVSTORE = 'core.kvstore.CacheKVStore'
+THUMBNAIL_CACHE = 'thumbnails'
+
+# Фоновые задачи выполняются сразу в вызвавшем процессе; с False они
+# ждут в таблице core_job воркера manage.py runworker.
+JOB_QUEUE_EAGER = True
+JOB_MAX_ATTEMPTS = 5
+
+TIMELINE_MAX_LENGTH = 1000
+TIMELINE_CELEBRITY_THRESHOLD = 10000
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Ключи миниатюр не должны вытесняться вместе с остальным кешем.
+    'thumbnails': {
+        'BACKEND': 'core.kvstore.ThumbnailCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'thumbnails'),
+    },
 }
 
+# Сессия и пользователь запроса читаются из кеша, без запросов к базе.
+SESSION_ENGINE = 'core.sessions'
+# Как часто изменения сессии, кроме входа и выхода, доходят до базы.
+SESSION_WRITE_BEHIND_SECONDS = 60
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
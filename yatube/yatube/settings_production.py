@@ -0,0 +1,73 @@
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, os
+
+# Несколько воркеров gunicorn: кеш должен быть общим для всех процессов.
+# DJANGO_SETTINGS_MODULE=yatube.settings_production
+
+DEBUG = False
+
+# Задачи выполняет manage.py runworker.
+JOB_QUEUE_EAGER = False
+
+# WAL пускает чтение параллельно с записью, а писатели ждут друг друга
+# до busy_timeout. Соединение живет CONN_MAX_AGE секунд между запросами.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 2 ** 10,
+    'temp_store': 'MEMORY',
+}
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': 60,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    },
+    # Копия основной базы для чтения; ее обновляет sync_replica --interval.
+    'replica': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'PRAGMAS': {**SQLITE_PRAGMAS, 'query_only': 1},
+        'TEST': {'MIRROR': 'default'},
+    },
+    # Сессии и таблица sorl не делят блокировку записи с записями и
+    # комментариями; таблицы создает migrate --database sessions
+    # (thumbnails).
+    'sessions': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db.sessions.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    },
+    'thumbnails': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db.thumbnails.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'PRAGMAS': SQLITE_PRAGMAS,
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.tiered_cache.TieredCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+            'L1_MAX_ENTRIES': 1000,
+            'L1_TIMEOUT': 60,
+            'L2_ONLY_PREFIXES': (
+                'page_cache:', 'query_cache:', 'session_cache:',
+                'tiered_cache:',
+            ),
+        },
+    },
+    'thumbnails': {
+        'BACKEND': 'core.kvstore.ThumbnailCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'thumbnails'),
+    },
+}